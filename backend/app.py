@@ -1,44 +1,298 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+import json
 import os
-from extract_bingo_data import extract_bingo_data
-from generate_cards import generate_cards
+import time
+from contextlib import contextmanager
+import metrics
+from generate_cards import iter_cards, iter_numbered_cards
+from card_signatures import CardConstraintError
+from card_encoding import CardEncoder, FORMATS
+from jobs import JobQueue, JobQueueFull
+from phrase_index import get_phrase_index, parse_languages, MISSING_TRANSLATION_POLICIES
+from planner import plan_capacity
+from print_pages import get_print_renderer, page_ranges
+from uploads import UploadSlots, UploadSlotsExhausted, remove_upload, spool_upload
+from winners import GameRegistry
+from workbook_cache import WorkbookCache
+from datasets import DatasetRegistry
 
 app = Flask(__name__)
 CORS(app)
 
 ALLOWED_EXTENSIONS = {'xlsx'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+MAX_CARDS_PER_QUEST = 10000
+MAX_CARDS_PER_PAGE = 1000
+MAX_GAME_CARDS = 100000
+MAX_JOB_CARDS_PER_QUEST = 1000000
+MAX_PRINT_CARDS_PER_PAGE = 100
+# Highest number of the first printed card of a quest
+MAX_PRINT_OFFSET = 2 ** 32
 
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['WORKBOOK_CACHE_SIZE'] = int(os.environ.get('WORKBOOK_CACHE_SIZE', 32))
+app.config['WORKBOOK_CACHE_MAX_BYTES'] = int(os.environ.get('WORKBOOK_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+app.config['WORKBOOK_CACHE_TTL'] = float(os.environ.get('WORKBOOK_CACHE_TTL', 3600))
+app.config['WORKBOOK_CACHE_DIR'] = os.environ.get('WORKBOOK_CACHE_DIR')
+app.config['WORKBOOK_CACHE_DISK_MAX_BYTES'] = int(os.environ.get('WORKBOOK_CACHE_DISK_MAX_BYTES', 1024 * 1024 * 1024))
+# Registered datasets are dropped after DATASET_TTL seconds without use
+app.config['MAX_DATASETS'] = int(os.environ.get('MAX_DATASETS', 64))
+app.config['DATASET_TTL'] = float(os.environ.get('DATASET_TTL', 3600))
+app.config['GENERATION_WORKERS'] = int(os.environ.get('GENERATION_WORKERS', 1))
+app.config['MAX_GAMES'] = int(os.environ.get('MAX_GAMES', 100))
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['MAX_PENDING_JOBS'] = int(os.environ.get('MAX_PENDING_JOBS', 16))
+app.config['JOB_RESULT_DIR'] = os.environ.get('JOB_RESULT_DIR')
+app.config['JOB_TTL'] = float(os.environ.get('JOB_TTL', 3600))
+# Uploads are spooled to temporary files here (system default if unset), at most
+# MAX_CONCURRENT_UPLOADS at a time per process
+app.config['UPLOAD_DIR'] = os.environ.get('UPLOAD_DIR')
+app.config['MAX_CONCURRENT_UPLOADS'] = int(os.environ.get('MAX_CONCURRENT_UPLOADS', 4))
+app.config['UPLOAD_SLOT_TIMEOUT'] = float(os.environ.get('UPLOAD_SLOT_TIMEOUT', 5))
+# Collect /metrics, and add a Server-Timing header with the stages of each request
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '').lower() in {'1', 'true', 'yes'}
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '').lower() in {'1', 'true', 'yes'}
+
+metrics.enable(app.config['METRICS_ENABLED'])
+
+# Parsed workbooks by content hash, so repeated uploads of the same file skip parsing.
+# The hash also serves as the ID of datasets registered through /datasets.
+workbook_cache = WorkbookCache(
+    max_entries=app.config['WORKBOOK_CACHE_SIZE'],
+    max_bytes=app.config['WORKBOOK_CACHE_MAX_BYTES'],
+    ttl=app.config['WORKBOOK_CACHE_TTL'],
+    disk_dir=app.config['WORKBOOK_CACHE_DIR'],
+    max_disk_bytes=app.config['WORKBOOK_CACHE_DISK_MAX_BYTES'],
+)
+
+# Compact forms of the registered datasets, apart from the cache of one-off uploads
+datasets = DatasetRegistry(max_datasets=app.config['MAX_DATASETS'], ttl=app.config['DATASET_TTL'])
+
+# Uploads being spooled or parsed
+upload_slots = UploadSlots(app.config['MAX_CONCURRENT_UPLOADS'], app.config['UPLOAD_SLOT_TIMEOUT'])
+
+# Bulk generations that outlast a request, run in the background of this process
+jobs = JobQueue(
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['MAX_PENDING_JOBS'],
+    result_dir=app.config['JOB_RESULT_DIR'],
+    ttl=app.config['JOB_TTL'],
+)
+
+@app.before_request
+def start_request_metrics():
+    if app.config['SERVER_TIMING']:
+        metrics.start_timings()
+    if metrics.is_enabled():
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    if metrics.is_enabled():
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe(metrics.REQUEST_SECONDS, time.perf_counter() - g.request_start, endpoint)
+        metrics.count(metrics.REQUESTS, 1, endpoint, str(response.status_code))
+    if app.config['SERVER_TIMING']:
+        header = metrics.server_timing()
+        if header:
+            response.headers['Server-Timing'] = header
+    return response
+
+def spool(file):
+    """
+    Spool an uploaded file to a temporary file, recording its size.
+    Returns:
+        A tuple of (path, content hash)
+    """
+    with metrics.timed('upload'):
+        path, key, size = spool_upload(file.stream, app.config['UPLOAD_DIR'])
+    metrics.observe(metrics.WORKBOOK_BYTES, size)
+    return path, key
+
+@contextmanager
+def uploaded_workbook(file):
+    """
+    Hold an upload slot while the uploaded workbook is spooled to disk and used.
+    Yields (path, content hash), the file is removed afterwards.
+    """
+    with upload_slots:
+        path, key = spool(file)
+        try:
+            yield path, key
+        finally:
+            remove_upload(path)
+
+def busy_response(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = '30'
+    return response, 503
 
 def allowed_file(filename):
     """Check if the file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/generate-cards', methods=['POST'])
-def generate_bingo_cards():
+def parse_generation_options(values, max_cards_per_quest=MAX_CARDS_PER_QUEST):
+    """
+    Read card generation options from request values.
+    Args:
+        values: The request values
+        max_cards_per_quest: Upper limit of cards_per_quest
+    Returns:
+        A tuple of (options, error) where options are keyword arguments for generate_cards
+    """
+    try:
+        cards_per_quest = int(values.get('cards_per_quest', 1))
+    except ValueError:
+        return None, 'cards_per_quest must be an integer'
+    if not 1 <= cards_per_quest <= max_cards_per_quest:
+        return None, f'cards_per_quest must be between 1 and {max_cards_per_quest}'
+
+    unique_across_cards = values.get('unique_across_cards', '').lower() in {'1', 'true', 'yes'}
+
+    seed = values.get('seed')
+    if seed is not None:
+        try:
+            seed = int(seed)
+        except ValueError:
+            return None, 'seed must be an integer'
+        if seed < 0:
+            return None, 'seed must not be negative'
+
+    # Comma separated languages to draw one layout for, see generate_cards
+    languages = parse_languages(values.get('languages', ''))
+    missing_translation = values.get('missing_translation', 'require')
+    if missing_translation not in MISSING_TRANSLATION_POLICIES:
+        return None, f"missing_translation must be one of {', '.join(MISSING_TRANSLATION_POLICIES)}"
+
+    distinct_cards = values.get('distinct_cards', '').lower() in {'1', 'true', 'yes'}
+
+    max_line_overlap = values.get('max_line_overlap')
+    if max_line_overlap is not None:
+        try:
+            max_line_overlap = int(max_line_overlap)
+        except ValueError:
+            return None, 'max_line_overlap must be an integer'
+        if max_line_overlap < 0:
+            return None, 'max_line_overlap must not be negative'
+
+    return {
+        'cards_per_quest': cards_per_quest,
+        'unique_across_cards': unique_across_cards,
+        'seed': seed,
+        'workers': app.config['GENERATION_WORKERS'],
+        'languages': languages or None,
+        'missing_translation': missing_translation,
+        'distinct_cards': distinct_cards,
+        'max_line_overlap': max_line_overlap,
+    }, None
+
+def get_uploaded_file():
+    """
+    Get the uploaded workbook from the request.
+    Returns:
+        A tuple of (file, error_response)
+    """
     # Check if a file was actually sent
     if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
+        return None, (jsonify({'error': 'No file part'}), 400)
     
     file = request.files['file']
     
     # Check if a file was selected
     if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+        return None, (jsonify({'error': 'No selected file'}), 400)
     
     # Check if the file type is allowed
     if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed. Please upload an XLSX file'}), 400
+        return None, (jsonify({'error': 'File type not allowed. Please upload an XLSX file'}), 400)
+
+    return file, None
+
+def wants_stream():
+    """Check if the client asked for newline delimited JSON"""
+    return (request.args.get('stream') == '1' or
+            'application/x-ndjson' in request.headers.get('Accept', ''))
+
+def cards_response(bingo_data, result, options=None):
+    """
+    Build the response for generated cards, streamed if the client asked for it.
+    With ?format=compact or ?format=packed cards are sent as phrase IDs, preceded
+    by the phrase tables (the first line of a stream).
+    Args:
+        bingo_data: The data the cards are generated from
+        result: The (cards, error) tuple of a card iterator
+        options: The generation options, if generated with them
+    """
+    cards, error = result
+    options = options or {}
+    if error:
+        return jsonify({
+            'error': error
+        }), 400
+
+    card_format = request.args.get('format', 'full')
+    if card_format not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(sorted(FORMATS))}"}), 400
+
+    header = {}
+    if card_format != 'full':
+        encoder = CardEncoder(
+            bingo_data, packed=card_format == 'packed',
+            languages=options.get('languages'),
+            missing_translation=options.get('missing_translation', 'require')
+        )
+        header = encoder.header()
+        cards = map(encoder.encode, cards)
+
+    if wants_stream():
+        def stream():
+            count = 0
+            try:
+                # Generation and serialization interleave, timed as one stage
+                with metrics.timed('stream'):
+                    if header:
+                        yield json.dumps(header, ensure_ascii=False) + '\n'
+                    for card in cards:
+                        yield json.dumps(card, ensure_ascii=False) + '\n'
+                        count += 1
+            except Exception as e:
+                # Headers are already sent, report the error as the last line
+                yield json.dumps({'error': str(e)}) + '\n'
+            metrics.observe(metrics.REQUEST_CARDS, count)
+            metrics.count(metrics.CARDS, count)
+
+        return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+        
+    try:
+        with metrics.timed('generation'):
+            cards = list(cards)
+    except CardConstraintError as e:
+        return jsonify({'error': str(e)}), 400
+    metrics.observe(metrics.REQUEST_CARDS, len(cards))
+    metrics.count(metrics.CARDS, len(cards))
+    with metrics.timed('serialization'):
+        response = jsonify({
+            **header,
+            'cards': cards,
+        })
+    return response, 200
+
+@app.route('/generate-cards', methods=['POST'])
+def generate_bingo_cards():
+    file, error_response = get_uploaded_file()
+    if error_response:
+        return error_response
+    
+    options, error = parse_generation_options(request.values)
+    if error:
+        return jsonify({'error': error}), 400
     
     try:
-        # Read file content
-        file_content = file.read()
-        
-        # Extract data from Excel
-        bingo_data, error = extract_bingo_data(file_content)
+        # Extract data from Excel, or reuse it if the same file was uploaded before
+        with uploaded_workbook(file) as (path, key):
+            bingo_data, error = workbook_cache.get_or_extract(path, key)
         
         if error:
             return jsonify({
@@ -46,19 +300,382 @@ def generate_bingo_cards():
             }), 400
 
         # Generate cards from the bingo data
-        cards, error = generate_cards(bingo_data)
+        return cards_response(bingo_data, iter_cards(bingo_data, **options), options)
+        
+    except UploadSlotsExhausted as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/datasets', methods=['POST'])
+def register_dataset():
+    file, error_response = get_uploaded_file()
+    if error_response:
+        return error_response
+    
+    try:
+        with uploaded_workbook(file) as (path, dataset_id):
+            bingo_data, error = workbook_cache.get_or_extract(path, dataset_id)
         
         if error:
             return jsonify({
                 'error': error
             }), 400
-            
+
+        # Registering builds the phrase index, so generating by ID only samples from it
+        datasets.register(dataset_id, bingo_data)
+        
         return jsonify({
-            'cards': cards,
-        }), 200
+            'dataset_id': dataset_id,
+            'quests': [quest.name for quest in bingo_data.quests],
+            'phrases': len(get_phrase_index(bingo_data).texts),
+        }), 201
         
+    except UploadSlotsExhausted as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def get_dataset(dataset_id):
+    """
+    Get a registered dataset.
+    Returns:
+        A tuple of (bingo_data, error_response)
+    """
+    bingo_data = datasets.get(dataset_id)
+    if bingo_data is None:
+        # Registered before a restart or long unused, the workbook may still be cached
+        cached = workbook_cache.get(dataset_id)
+        if cached is not None:
+            bingo_data = datasets.register(dataset_id, cached)
+    if bingo_data is None:
+        return None, (jsonify({
+            'error': f"Unknown dataset '{dataset_id}'. It may have expired, please upload the file again"
+        }), 404)
+    return bingo_data, None
+
+@app.route('/datasets/<dataset_id>/cards', methods=['POST'])
+def generate_dataset_cards(dataset_id):
+    bingo_data, error_response = get_dataset(dataset_id)
+    if error_response:
+        return error_response
+    
+    options, error = parse_generation_options(request.values)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        return cards_response(bingo_data, iter_cards(bingo_data, **options), options)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_int_arg(name, default, minimum=0, maximum=None):
+    """
+    Read an integer query argument.
+    Returns:
+        A tuple of (value, error)
+    """
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        return None, f'{name} must be an integer'
+    if value < minimum or (maximum is not None and value > maximum):
+        limits = f'at least {minimum}' if maximum is None else f'between {minimum} and {maximum}'
+        return None, f'{name} must be {limits}'
+    return value, None
+
+@app.route('/datasets/<dataset_id>/cards', methods=['GET'])
+def list_numbered_cards(dataset_id):
+    """Page through the numbered cards of a quest, computed on demand from their number"""
+    bingo_data, error_response = get_dataset(dataset_id)
+    if error_response:
+        return error_response
+
+    quest_index, error = parse_int_arg('quest', 0)
+    if not error:
+        offset, error = parse_int_arg('offset', 0)
+    if not error:
+        limit, error = parse_int_arg('limit', 100, 1, MAX_CARDS_PER_PAGE)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        return cards_response(bingo_data, iter_numbered_cards(bingo_data, dataset_id, quest_index, offset, limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/datasets/<dataset_id>/cards/<int:number>', methods=['GET'])
+def get_numbered_card(dataset_id, number):
+    """Get one numbered card of a quest, the same card every time for the same dataset"""
+    bingo_data, error_response = get_dataset(dataset_id)
+    if error_response:
+        return error_response
+
+    quest_index, error = parse_int_arg('quest', 0)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        cards, error = iter_numbered_cards(bingo_data, dataset_id, quest_index, number, 1)
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify(next(cards)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Live games with the cards in play, for winner checks as phrases are called
+games = GameRegistry(max_games=app.config['MAX_GAMES'])
+
+@app.route('/datasets/<dataset_id>/print', methods=['GET'])
+def print_cards(dataset_id):
+    """
+    Render a page of numbered cards as print-ready HTML, one A4 sheet per card.
+
+    The cards_per_quest numbered cards of every quest are paged through quest by
+    quest, per_page at a time, so clients can load pages lazily. The number of pages
+    is sent in the X-Total-Pages header. With ?standalone=1 the page is a complete
+    HTML document with the print styles. Card numbers of every quest start at ?offset=
+    (default 0), so clients get another set of cards by picking another offset.
+    """
+    bingo_data, error_response = get_dataset(dataset_id)
+    if error_response:
+        return error_response
+
+    cards_per_quest, error = parse_int_arg('cards_per_quest', 1, 1, MAX_CARDS_PER_QUEST)
+    if not error:
+        per_page, error = parse_int_arg('per_page', 20, 1, MAX_PRINT_CARDS_PER_PAGE)
+    if not error:
+        page, error = parse_int_arg('page', 0)
+    if not error:
+        first_number, error = parse_int_arg('offset', 0, 0, MAX_PRINT_OFFSET)
+    if error:
+        return jsonify({'error': error}), 400
+
+    total_pages = -(-len(bingo_data.quests) * cards_per_quest // per_page)
+    if page >= total_pages:
+        return jsonify({'error': f'page must be less than {total_pages}'}), 404
+
+    try:
+        cards = []
+        for quest_index, offset, limit in page_ranges(len(bingo_data.quests), cards_per_quest, page, per_page):
+            quest_cards, error = iter_numbered_cards(
+                bingo_data, dataset_id, quest_index, first_number + offset, limit
+            )
+            if error:
+                return jsonify({'error': error}), 400
+            cards.extend(quest_cards)
+
+        with metrics.timed('render'):
+            html = get_print_renderer(bingo_data).render(cards, request.args.get('standalone') == '1')
+        response = Response(html, mimetype='text/html')
+        response.headers['X-Total-Pages'] = str(total_pages)
+        response.headers['Access-Control-Expose-Headers'] = 'X-Total-Pages'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/plan', methods=['POST'])
+def plan_workbook():
+    """Report how many cards the uploaded workbook supports without reusing phrases"""
+    file, error_response = get_uploaded_file()
+    if error_response:
+        return error_response
+
+    try:
+        with uploaded_workbook(file) as (path, key):
+            bingo_data, error = workbook_cache.get_or_extract(path, key)
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify(plan_capacity(bingo_data)), 200
+    except UploadSlotsExhausted as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/datasets/<dataset_id>/plan', methods=['GET'])
+def plan_dataset(dataset_id):
+    """Report how many cards a registered dataset supports without reusing phrases"""
+    bingo_data, error_response = get_dataset(dataset_id)
+    if error_response:
+        return error_response
+    return jsonify(plan_capacity(bingo_data)), 200
+
+@app.route('/games', methods=['POST'])
+def create_game():
+    """
+    Start a game on a registered dataset. The JSON body has the dataset_id and either
+    the issued cards (as returned by the card endpoints) or the quest, offset and
+    limit of a range of numbered cards.
+    """
+    body = request.get_json(silent=True) or {}
+    bingo_data, error_response = get_dataset(str(body.get('dataset_id', '')))
+    if error_response:
+        return error_response
+
+    try:
+        if 'cards' in body:
+            cards = body['cards']
+            if not isinstance(cards, list) or not all(
+                    isinstance(card, dict) and isinstance(card.get('quest'), str)
+                    and isinstance(card.get('card'), list)
+                    and all(isinstance(phrase, str) for phrase in card['card'])
+                    for card in cards):
+                return jsonify({'error': "cards must be a list of cards with a 'quest' and a 'card' list of strings"}), 400
+        else:
+            try:
+                quest_index = int(body.get('quest', 0))
+                offset = int(body.get('offset', 0))
+                limit = int(body.get('limit', 0))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'quest, offset and limit must be integers'}), 400
+            if not 1 <= limit <= MAX_GAME_CARDS:
+                return jsonify({'error': f'limit must be between 1 and {MAX_GAME_CARDS}'}), 400
+            cards, error = iter_numbered_cards(bingo_data, body['dataset_id'], quest_index, offset, limit)
+            if error:
+                return jsonify({'error': error}), 400
+            cards = list(cards)
+
+        if len(cards) > MAX_GAME_CARDS:
+            return jsonify({'error': f'A game can have at most {MAX_GAME_CARDS} cards'}), 400
+
+        game_id = games.create(cards, bingo_data.difficulties)
+        return jsonify({
+            'game_id': game_id,
+            'cards': len(cards),
+        }), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/games/<game_id>/call', methods=['POST'])
+def call_phrase(game_id):
+    """Call one phrase (or a list of phrases) and return the lines it completes"""
+    game = games.get(game_id)
+    if game is None:
+        return jsonify({'error': f"Unknown game '{game_id}'"}), 404
+
+    body = request.get_json(silent=True) or {}
+    if 'phrases' in body:
+        phrases = body['phrases']
+    elif 'phrase' in body:
+        phrases = [body['phrase']]
+    else:
+        return jsonify({'error': "Call a 'phrase' or a list of 'phrases'"}), 400
+    if not isinstance(phrases, list) or not all(isinstance(phrase, str) for phrase in phrases):
+        return jsonify({'error': 'Phrases must be strings'}), 400
+
+    return jsonify({
+        'winners': game.call_many(phrases),
+    }), 200
+
+def generation_job(path, key, options, card_format):
+    """Work for the job queue: parse the spooled workbook and write its cards as NDJSON"""
+    def work(job, file):
+        bingo_data, error = workbook_cache.get_or_extract(path, key)
+        if error:
+            return error
+        cards, error = iter_cards(bingo_data, **options)
+        if error:
+            return error
+        job.total = (len(bingo_data.quests) * options['cards_per_quest'] *
+                     len(options['languages'] or [None]))
+
+        if card_format != 'full':
+            encoder = CardEncoder(
+                bingo_data, packed=card_format == 'packed',
+                languages=options['languages'],
+                missing_translation=options['missing_translation']
+            )
+            file.write(json.dumps(encoder.header(), ensure_ascii=False) + '\n')
+            cards = map(encoder.encode, cards)
+        try:
+            for card in cards:
+                file.write(json.dumps(card, ensure_ascii=False) + '\n')
+                job.advance()
+        except CardConstraintError as e:
+            return str(e)
+        metrics.count(metrics.CARDS, job.done)
+        return None
+    return work
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a bulk generation with the same file and options as /generate-cards and
+    return its job ID right away. Poll /jobs/<id> and fetch /jobs/<id>/result when done.
+    """
+    file, error_response = get_uploaded_file()
+    if error_response:
+        return error_response
+
+    options, error = parse_generation_options(request.values, MAX_JOB_CARDS_PER_QUEST)
+    if error:
+        return jsonify({'error': error}), 400
+    card_format = request.values.get('format', 'full')
+    if card_format not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(sorted(FORMATS))}"}), 400
+
+    try:
+        # The spooled file outlives the request, the job removes it when it ends
+        with upload_slots:
+            path, key = spool(file)
+    except UploadSlotsExhausted as e:
+        return busy_response(e)
+    try:
+        job = jobs.submit(generation_job(path, key, options, card_format), lambda: remove_upload(path))
+    except JobQueueFull as e:
+        remove_upload(path)
+        return busy_response(e)
+    return jsonify(job.to_dict()), 202
+
+def get_job(job_id):
+    """
+    Look up a job.
+    Returns:
+        A tuple of (job, error_response)
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return None, (jsonify({'error': f"Unknown job '{job_id}'. It may have expired"}), 404)
+    return job, None
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the status and progress (cards done out of total) of a job"""
+    job, error_response = get_job(job_id)
+    if error_response:
+        return error_response
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Stream the NDJSON output of a finished job"""
+    job, error_response = get_job(job_id)
+    if error_response:
+        return error_response
+    if job.status != 'done':
+        return jsonify({**job.to_dict(), 'error': job.error or f"Job is {job.status}"}), 409
+    return send_file(job.path, mimetype='application/x-ndjson', download_name=f'{job.id}.ndjson')
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown job '{job_id}'. It may have expired"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Counters and histograms of this process in Prometheus text format"""
+    if not metrics.is_enabled():
+        return jsonify({'error': 'Metrics are disabled, set METRICS_ENABLED=1 to collect them'}), 404
+    return Response(metrics.expose(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({**workbook_cache.stats(), **datasets.stats()}), 200
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Benchmark the card fill step against the pool size.
+
+Compares the previous fill loop (random.choice + list.remove on positions and
+phrases) with generate_cards._fill_card. Usage, from the backend directory:
+
+    python benchmarks/bench_fill.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from generate_cards import _fill_card
+
+DIFFICULTIES = ["easy"] * 10 + ["medium"] * 10 + ["hard"] * 5
+POOL_SIZES = [100, 1_000, 10_000, 100_000]
+REPEATS = 200
+
+def legacy_fill_card(phrase_pools, positions_by_difficulty, card_size):
+    """The pre-index fill loop: copy the pools, then choose and remove one phrase at a time"""
+    phrase_pools = {
+        difficulty: [phrases.copy() for phrases in pools]
+        for difficulty, pools in phrase_pools.items()
+    }
+    card = [None] * card_size
+    for difficulty, positions in positions_by_difficulty.items():
+        difficulty_positions = positions.copy()
+        while difficulty_positions:
+            position = random.choice(difficulty_positions)
+            difficulty_positions.remove(position)
+            for phrases in phrase_pools[difficulty]:
+                if phrases:
+                    selected = random.choice(phrases)
+                    phrases.remove(selected)
+                    card[position] = selected
+                    break
+    return card
+
+def main():
+    positions_by_difficulty = {}
+    for pos, diff in enumerate(DIFFICULTIES):
+        positions_by_difficulty.setdefault(diff, []).append(pos)
+
+    print(f"{'pool size':>10} {'legacy ms/card':>15} {'current ms/card':>16} {'speedup':>8}")
+    for pool_size in POOL_SIZES:
+        # Two types per difficulty, the preferred one half the size of the other
+        phrase_pools = {
+            difficulty: [
+                [f"{difficulty} preferred {i}" for i in range(pool_size // 3)],
+                [f"{difficulty} fallback {i}" for i in range(pool_size - pool_size // 3)],
+            ]
+            for difficulty in positions_by_difficulty
+        }
+        legacy = timeit.timeit(
+            lambda: legacy_fill_card(phrase_pools, positions_by_difficulty, len(DIFFICULTIES)),
+            number=REPEATS
+        ) / REPEATS * 1000
+        current = timeit.timeit(
+            lambda: _fill_card(phrase_pools, positions_by_difficulty, len(DIFFICULTIES), True),
+            number=REPEATS
+        ) / REPEATS * 1000
+        print(f"{pool_size:>10} {legacy:>15.3f} {current:>16.3f} {legacy / current:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
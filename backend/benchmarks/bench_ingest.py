@@ -0,0 +1,43 @@
+"""
+Benchmark extract_bingo_data against the number of phrase rows.
+
+Writes synthetic workbooks with 8 translation columns and reports parse time and
+peak Python memory (tracemalloc) per phrase row. Usage, from the backend directory:
+
+    python benchmarks/bench_ingest.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extract_bingo_data import extract_bingo_data
+from workbooks import LANGUAGES, make_workbook
+
+ROW_COUNTS = [1_000, 10_000, 40_000]
+
+def main():
+    print(f"{'rows':>8} {'seconds':>8} {'us/row':>8} {'peak MB':>8} {'peak B/row':>11}")
+    for rows in ROW_COUNTS:
+        content = make_workbook(rows, languages=len(LANGUAGES), quests=len(LANGUAGES))
+
+        start = time.perf_counter()
+        data, error = extract_bingo_data(content)
+        elapsed = time.perf_counter() - start
+        assert error is None, error
+        assert len(data.phrases) == rows
+        del data
+
+        tracemalloc.start()
+        data, _ = extract_bingo_data(content)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del data
+
+        print(f"{rows:>8} {elapsed:>8.2f} {elapsed / rows * 1e6:>8.1f} "
+              f"{peak / 2**20:>8.1f} {peak / rows:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Time each stage of card generation on a synthetic workbook and save the results as JSON.
+
+Stages:
+    openpyxl_load    load_workbook and read the raw rows of every sheet
+    extract          extract_bingo_data as a whole
+    row_processing   extract minus openpyxl_load, turning rows into models
+    validation       full Pydantic validation of the extracted rows, the path
+                     extract_bingo_data falls back to for unusual cells
+    pool_building    PhraseIndex for the extracted data
+    fill             generate_cards with one card per quest, index already built
+    batch            generate_cards with --cards cards per quest
+    end_to_end       POST /generate-cards through the Flask test client, with an
+                     empty workbook cache
+
+Every stage is repeated and reported as its best and median time. Usage, from the
+backend directory:
+
+    python benchmarks/bench_stages.py --phrases 20000 --output before.json
+    python benchmarks/bench_stages.py --phrases 20000 --compare before.json
+
+With --compare the results are checked against an earlier run with the same
+workbook settings, exiting with status 1 if a stage median got slower than allowed.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from openpyxl import load_workbook
+from app import app, workbook_cache
+from extract_bingo_data import extract_bingo_data
+from generate_cards import generate_cards
+from phrase_index import PhraseIndex
+from schemas import Phrase, Quest
+from workbooks import LANGUAGES, PATTERN_SHAPES, make_workbook
+
+# Workbook and generation settings that must match for results to be comparable
+WORKLOAD_SETTINGS = ('phrases', 'languages', 'types', 'quests', 'pattern', 'weights', 'cards')
+STAGES = (
+    'openpyxl_load', 'extract', 'row_processing', 'validation',
+    'pool_building', 'fill', 'batch', 'end_to_end'
+)
+
+def measure(function, repeats: int) -> dict:
+    """Call function repeats times and summarize the wall clock times in seconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'repeats': repeats}
+
+def read_raw_rows(content: bytes):
+    wb = load_workbook(filename=BytesIO(content), read_only=True, data_only=True)
+    for ws in wb.worksheets:
+        for _ in ws.iter_rows(values_only=True):
+            pass
+    wb.close()
+
+def validate_rows(data):
+    """Validate the extracted data the way rows without a fast path are"""
+    for quest in data.quests:
+        Quest.model_validate(quest.model_dump())
+    for phrase in data.phrases:
+        Phrase.model_validate(phrase.model_dump())
+
+def post_workbook(client, content: bytes, cards: int):
+    workbook_cache.clear()
+    response = client.post(
+        f'/generate-cards?cards_per_quest={cards}',
+        data={'file': (BytesIO(content), 'benchmark.xlsx')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+def run(args) -> dict:
+    content = make_workbook(
+        phrases=args.phrases, languages=args.languages, types=args.types,
+        quests=args.quests, pattern=args.pattern, weights=args.weights
+    )
+    data, error = extract_bingo_data(content)
+    if error:
+        raise SystemExit(f"Synthetic workbook failed to load: {error}")
+    generate_cards(data)  # Builds and caches the phrase index for fill and batch
+    client = app.test_client()
+
+    stages = {
+        'openpyxl_load': measure(lambda: read_raw_rows(content), args.repeats),
+        'extract': measure(lambda: extract_bingo_data(content), args.repeats),
+        'validation': measure(lambda: validate_rows(data), args.repeats),
+        'pool_building': measure(lambda: PhraseIndex(data), args.repeats),
+        'fill': measure(lambda: generate_cards(data), args.repeats),
+        'batch': measure(lambda: generate_cards(data, cards_per_quest=args.cards), args.repeats),
+        'end_to_end': measure(lambda: post_workbook(client, content, args.cards), args.repeats),
+    }
+    stages['row_processing'] = {
+        key: max(stages['extract'][key] - stages['openpyxl_load'][key], 0.0)
+        for key in ('best', 'median')
+    }
+    stages['row_processing']['repeats'] = args.repeats
+    stages = {name: stages[name] for name in STAGES}
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'settings': {
+            **{name: getattr(args, name) for name in WORKLOAD_SETTINGS},
+            'repeats': args.repeats,
+            'workbook_bytes': len(content),
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'cpus': os.cpu_count(),
+        },
+        'stages': stages,
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print the median of every stage against the baseline.
+    Returns:
+        True if no stage is slower than the baseline by more than tolerance
+    """
+    mismatched = [
+        name for name in WORKLOAD_SETTINGS
+        if baseline['settings'].get(name) != results['settings'][name]
+    ]
+    if mismatched:
+        print(f"Warning: baseline differs in {', '.join(mismatched)}, times are not comparable")
+
+    passed = True
+    print(f"{'stage':<16} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, stage in results['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        before = baseline['stages'][name]['median']
+        after = stage['median']
+        ratio = after / before if before else float('inf')
+        regressed = ratio > 1 + tolerance
+        passed = passed and not regressed
+        print(f"{name:<16} {before * 1e3:>8.1f}ms {after * 1e3:>8.1f}ms {ratio:>6.2f}x"
+              f"{'  REGRESSION' if regressed else ''}")
+    return passed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time the stages of card generation")
+    parser.add_argument('--phrases', type=int, default=10_000, help="Phrase rows (default: 10000)")
+    parser.add_argument('--languages', type=int, default=2,
+                        help=f"Translation columns, at most {len(LANGUAGES)} (default: 2)")
+    parser.add_argument('--types', type=int, default=2, help="Phrase types (default: 2)")
+    parser.add_argument('--quests', type=int, default=4, help="Quests (default: 4)")
+    parser.add_argument('--pattern', choices=PATTERN_SHAPES, default='diagonal',
+                        help="Pattern shape (default: diagonal)")
+    parser.add_argument('--weights', action='store_true', help="Add a weight column")
+    parser.add_argument('--cards', type=int, default=1_000,
+                        help="Cards per quest for the batch and end_to_end stages (default: 1000)")
+    parser.add_argument('--repeats', type=int, default=5, help="Runs per stage (default: 5)")
+    parser.add_argument('--output', help="File to save the results to as JSON")
+    parser.add_argument('--compare', help="Results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown of a stage median before it counts as a regression (default: 0.2)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    results = run(args)
+
+    print(f"{'stage':<16} {'best':>10} {'median':>10}")
+    for name, stage in results['stages'].items():
+        print(f"{name:<16} {stage['best'] * 1e3:>8.1f}ms {stage['median'] * 1e3:>8.1f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        print()
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Synthetic workbooks for the benchmarks, in the layout extract_bingo_data reads.
+"""
+from io import BytesIO
+from typing import List
+
+from openpyxl import Workbook
+
+LANGUAGES = ["english", "finnish", "spanish", "swedish", "german", "french", "italian", "dutch"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+TYPES_HEADER = 'types (order matters! first ones are filled first)'
+
+PATTERN_SHAPES = ('diagonal', 'uniform', 'rings', 'mixed')
+# extract_bingo_data reads a 5x5 board
+SIZE = 5
+
+def make_pattern(shape: str = 'diagonal') -> List[List[str]]:
+    """
+    Build a 5x5 pattern of difficulties.
+    Args:
+        shape: 'diagonal' (hard diagonal on easy), 'uniform' (all easy), 'rings'
+            (easy border, medium ring, hard centre) or 'mixed' (all three in turn)
+    """
+    size = SIZE
+    if shape == 'diagonal':
+        return [['hard' if row == col else 'easy' for col in range(size)] for row in range(size)]
+    if shape == 'uniform':
+        return [['easy'] * size for _ in range(size)]
+    if shape == 'rings':
+        return [
+            [DIFFICULTIES[min(row, col, size - 1 - row, size - 1 - col, 2)] for col in range(size)]
+            for row in range(size)
+        ]
+    if shape == 'mixed':
+        return [[DIFFICULTIES[(row * size + col) % 3] for col in range(size)] for row in range(size)]
+    raise ValueError(f"Unknown pattern shape '{shape}'")
+
+def make_workbook(
+    phrases: int = 1_000,
+    languages: int = 2,
+    types: int = 2,
+    quests: int = 2,
+    pattern: str = 'diagonal',
+    translated: float = 0.8,
+    weights: bool = False
+) -> bytes:
+    """
+    Write a synthetic workbook.
+    Args:
+        phrases: Number of phrase rows, spread evenly over difficulties and types
+        languages: Number of translation columns, at most len(LANGUAGES)
+        types: Number of phrase types, quests prefer them in rotating order
+        quests: Number of quests, their languages cycle through the translation columns
+        pattern: Pattern shape, see make_pattern
+        translated: Share of translation cells (after the first language) that are filled
+        weights: Add a weight column with varying weights
+    Returns:
+        The XLSX file content
+    """
+    if not 1 <= languages <= len(LANGUAGES):
+        raise ValueError(f"languages must be between 1 and {len(LANGUAGES)}")
+    used_languages = LANGUAGES[:languages]
+    type_names = [f"type{t + 1}" for t in range(types)]
+    wb = Workbook(write_only=True)
+
+    quest_sheet = wb.create_sheet('quests')
+    quest_sheet.append(['name', 'language', TYPES_HEADER])
+    for q in range(quests):
+        preferred = type_names[q % types:] + type_names[:q % types]
+        quest_sheet.append([f"Quest {q + 1}", used_languages[q % languages], ';'.join(preferred)])
+
+    phrase_sheet = wb.create_sheet('phrases')
+    phrase_sheet.append([
+        'difficulty', 'type', *(['weight'] if weights else []),
+        *(f"translation-{language}" for language in used_languages)
+    ])
+    # Every n-th cell of the other languages stays empty
+    gap = round(1 / (1 - translated)) if translated < 1 else 0
+    for i in range(phrases):
+        phrase_sheet.append([
+            DIFFICULTIES[i % 3],
+            type_names[i // 3 % types],
+            *([1 + i % 4] if weights else []),
+            *(
+                None if j and gap and (i + j) % gap == 0 else f"{language} phrase number {i}"
+                for j, language in enumerate(used_languages)
+            )
+        ])
+
+    pattern_sheet = wb.create_sheet('pattern')
+    for row in make_pattern(pattern):
+        pattern_sheet.append(row)
+
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
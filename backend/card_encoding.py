@@ -0,0 +1,161 @@
+from array import array
+from typing import Dict, List
+import base64
+import sys
+from schemas import BingoData
+from phrase_index import get_phrase_index
+
+FORMATS = {'full', 'compact', 'packed'}
+
+class CardEncoder:
+    """
+    Encodes cards as phrase IDs into one phrase table per language.
+
+    The 'compact' format sends each card as a list of integer IDs, 'packed' as the
+    base64 of little-endian unsigned 16-bit IDs (32-bit if a table is too large).
+    """
+
+    def __init__(self, data: BingoData, packed: bool = False,
+                 languages: List[str] | None = None, missing_translation: str = 'require'):
+        """
+        Args:
+            data: BingoData the cards are generated from
+            packed: Whether to encode cards as base64 instead of int lists
+            languages: Languages of aligned generation, see generate_cards
+            missing_translation: Policy of aligned generation, with 'fallback' the
+                tables of those languages also hold the quest language texts
+        """
+        index = get_phrase_index(data)
+
+        # Languages whose texts can appear in a table, for the types they are used with
+        sources: Dict[str, Dict[str, set]] = {}
+        self.quest_languages: Dict[str, List[str]] = {}
+        all_types = {phrase_type for quest in data.quests for phrase_type in quest.types}
+        for quest in data.quests:
+            sources.setdefault(quest.language, {}).setdefault(quest.language, set()).update(quest.types)
+            languages_of_quest = self.quest_languages.setdefault(quest.name, [])
+            if quest.language not in languages_of_quest:
+                languages_of_quest.append(quest.language)
+        for language in languages or []:
+            sources.setdefault(language, {}).setdefault(language, set()).update(all_types)
+            if missing_translation == 'fallback':
+                for quest in data.quests:
+                    sources[language].setdefault(quest.language, set()).update(quest.types)
+
+        # Only the phrases the quests can draw from, in index order
+        self.tables: Dict[str, List[str]] = {language: [] for language in sources}
+        self.ids: Dict[str, Dict[str, int]] = {language: {} for language in sources}
+        for language, source_types in sources.items():
+            table = self.tables[language]
+            ids = self.ids[language]
+            for (source_language, phrase_type, _), texts in index.pools.items():
+                if phrase_type not in source_types.get(source_language, ()):
+                    continue
+                for text in texts:
+                    if text not in ids:
+                        ids[text] = len(table)
+                        table.append(text)
+
+        self.packed = packed
+        largest = max((len(table) for table in self.tables.values()), default=0)
+        self.typecode = 'H' if largest <= 0xFFFF else 'I'
+
+    def header(self) -> Dict[str, any]:
+        """The phrase tables and how to read the encoded cards"""
+        header = {'phrases': self.tables}
+        if self.packed:
+            header['encoding'] = 'uint16-le-base64' if self.typecode == 'H' else 'uint32-le-base64'
+        return header
+
+    def encode(self, card_data: Dict[str, any]) -> Dict[str, any]:
+        """Replace the phrases of a card with their IDs and add the card's language"""
+        card = card_data['card']
+        language = card_data.get('language')
+        if language is None:
+            languages = self.quest_languages[card_data['quest']]
+            language = languages[0]
+            if len(languages) > 1:
+                # Quests sharing a name can use different languages whose tables may
+                # share texts, any table holding every phrase decodes the card back
+                language = next(
+                    (language for language in languages if all(text in self.ids[language] for text in card)),
+                    language
+                )
+        ids = self.ids[language]
+        phrase_ids = [ids[text] for text in card]
+
+        encoded = {key: value for key, value in card_data.items() if key != 'card'}
+        encoded['language'] = language
+        if self.packed:
+            packed = array(self.typecode, phrase_ids)
+            if sys.byteorder == 'big':
+                packed.byteswap()
+            encoded['card'] = base64.b64encode(packed.tobytes()).decode('ascii')
+        else:
+            encoded['card'] = phrase_ids
+        return encoded
+
+def decode_card(encoded: Dict[str, any], header: Dict[str, any]) -> Dict[str, any]:
+    """Turn an encoded card back into the full format (keeping its language), given the header it came with"""
+    table = header['phrases'][encoded['language']]
+    phrase_ids = encoded['card']
+    if isinstance(phrase_ids, str):
+        packed = array('H' if header['encoding'] == 'uint16-le-base64' else 'I')
+        packed.frombytes(base64.b64decode(phrase_ids))
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        phrase_ids = packed.tolist()
+
+    decoded = {key: value for key, value in encoded.items() if key != 'card'}
+    decoded['card'] = [table[phrase_id] for phrase_id in phrase_ids]
+    return decoded
+
+if __name__ == '__main__':
+    import unittest
+    from generate_cards import generate_cards
+    from schemas import Phrase, Quest, Translation
+
+    class TestCardEncoding(unittest.TestCase):
+        def setUp(self):
+            # The first easy phrases are written the same in both languages
+            phrases = [
+                Phrase(translations=[Translation(language="english", text=f"Shared {i}" if i < 5 else f"Easy {i}"),
+                                     Translation(language="finnish", text=f"Shared {i}" if i < 5 else f"Helppo {i}")],
+                       type="t", difficulty="easy")
+                for i in range(30)
+            ]
+            self.data = BingoData(
+                quests=[Quest(name="Quest", language="english", types=["t"]),
+                        Quest(name="Quest", language="finnish", types=["t"])],
+                phrases=phrases, difficulties=["easy"] * 25
+            )
+
+        def round_trip(self, cards, encoder):
+            header = encoder.header()
+            for card in cards:
+                self.assertEqual({key: value for key, value in decode_card(encoder.encode(card), header).items()
+                                  if key in card}, card)
+
+        def test_compact_and_packed(self):
+            cards, error = generate_cards(self.data, cards_per_quest=20, seed=3)
+            self.assertIsNone(error)
+            for packed in (False, True):
+                encoder = CardEncoder(self.data, packed=packed)
+                self.round_trip(cards, encoder)
+            self.assertEqual(CardEncoder(self.data, packed=True).header()['encoding'], 'uint16-le-base64')
+            self.assertIsInstance(CardEncoder(self.data, packed=True).encode(cards[0])['card'], str)
+
+        def test_quests_sharing_a_name(self):
+            cards, _ = generate_cards(self.data, cards_per_quest=50, seed=4)
+            encoder = CardEncoder(self.data)
+            # Cards starting with a text of both tables are still encoded in a table holding every phrase
+            self.assertTrue(any(card['card'][0].startswith("Shared") for card in cards))
+            self.round_trip(cards, encoder)
+            languages = {encoder.encode(card)['language'] for card in cards if "Helppo 5" in card['card']}
+            self.assertEqual(languages, {"finnish"})
+
+        def test_aligned_languages(self):
+            cards, _ = generate_cards(self.data, cards_per_quest=3, seed=5, languages=["english", "finnish"])
+            self.round_trip(cards, CardEncoder(self.data, packed=True, languages=["english", "finnish"]))
+
+    unittest.main()
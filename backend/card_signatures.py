@@ -0,0 +1,65 @@
+from itertools import combinations
+from typing import Hashable, List, Sequence
+from winners import winning_lines
+
+class CardConstraintError(Exception):
+    """Raised when no card meeting the duplicate and overlap constraints can be drawn"""
+
+class CardSignatures:
+    """
+    Hashed signatures of the cards accepted so far, to reject cards that repeat one.
+
+    A card is identified by the hash of its phrase set, regardless of positions.
+    With a line overlap limit K, every (K + 1)-subset of the phrases on each winning
+    line is hashed into one set: two cards share more than K phrases on a line exactly
+    when they share such a subset. Checking a card therefore costs a fixed number of
+    set lookups, independent of the number of cards already accepted.
+    """
+
+    def __init__(
+        self,
+        difficulties: List[str],
+        distinct_cards: bool = True,
+        max_line_overlap: int | None = None
+    ):
+        """
+        Args:
+            difficulties: The pattern the cards are generated with
+            distinct_cards: Reject cards with the phrase set of an accepted card
+            max_line_overlap: If given, reject cards sharing more than this many
+                phrases on one winning line with an accepted card (on any line of it)
+        """
+        self.distinct_cards = distinct_cards
+        self.subset_size = None if max_line_overlap is None else max_line_overlap + 1
+        self.lines = []
+        if self.subset_size is not None:
+            # Lines shorter than a subset cannot break the limit
+            self.lines = [
+                slots for _, slots in winning_lines(difficulties) if len(slots) >= self.subset_size
+            ]
+        self.card_hashes = set()
+        self.line_hashes = set()
+
+    def add(self, card: Sequence[Hashable]) -> bool:
+        """
+        Accept the card if it meets the constraints.
+        Returns:
+            True if the card was recorded, False if it was rejected
+        """
+        card_hash = None
+        if self.distinct_cards:
+            card_hash = hash(frozenset(card))
+            if card_hash in self.card_hashes:
+                return False
+
+        line_hashes = set()
+        for slots in self.lines:
+            for subset in combinations([card[slot] for slot in slots], self.subset_size):
+                line_hashes.add(hash(frozenset(subset)))
+        if not self.line_hashes.isdisjoint(line_hashes):
+            return False
+
+        if card_hash is not None:
+            self.card_hashes.add(card_hash)
+        self.line_hashes |= line_hashes
+        return True
@@ -1,32 +1,109 @@
+import argparse
 import json
+import os
 import sys
-from bingo import generate_cards
+from extract_bingo_data import extract_bingo_data
+from generate_cards import iter_cards
+from card_signatures import CardConstraintError
+from phrase_index import parse_languages, MISSING_TRANSLATION_POLICIES
 
-def save_cards_to_json(cards, language):
-    """Save generated cards to JSON file."""
-    data = {"cards": cards}
-    with open(f"{language}.json", 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=2, ensure_ascii=False)
+OUTPUT_FORMATS = ('json', 'ndjson')
+
+def write_cards(cards, file, output_format='json'):
+    """
+    Write cards to a text file as they are generated, without collecting them first.
+    Args:
+        cards: Iterator over generated cards
+        file: Text file to write to
+        output_format: 'json' for a {"cards": [...]} document, 'ndjson' for one card per line
+    Returns:
+        The number of cards written
+    """
+    count = 0
+    if output_format == 'ndjson':
+        for card in cards:
+            file.write(json.dumps(card, ensure_ascii=False) + '\n')
+            count += 1
+        return count
+
+    file.write('{"cards": [')
+    for card in cards:
+        file.write(',\n  ' if count else '\n  ')
+        file.write(json.dumps(card, ensure_ascii=False))
+        count += 1
+    file.write('\n]}\n' if count else ']}\n')
+    return count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate bingo cards from a workbook")
+    parser.add_argument('workbook', help="XLSX file with quests, phrases and pattern sheets")
+    parser.add_argument('cards_per_quest', nargs='?', type=int, default=1,
+                        help="Number of cards to generate for each quest (default: 1)")
+    parser.add_argument('-o', '--output',
+                        help="File to write the cards to (default: the workbook name with the format's extension)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help="Output format, NDJSON writes one card per line "
+                             "(default: ndjson for .ndjson outputs, json otherwise)")
+    parser.add_argument('--unique', action='store_true',
+                        help="Do not reuse phrases between the cards of a quest until they run out")
+    parser.add_argument('--seed', type=int, help="Master seed for reproducible cards")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes to generate with (default: 1)")
+    parser.add_argument('--languages',
+                        help="Comma separated languages to print every card layout in")
+    parser.add_argument('--missing-translation', choices=MISSING_TRANSLATION_POLICIES, default='require',
+                        help="How to handle phrases missing one of --languages (default: require)")
+    parser.add_argument('--distinct', action='store_true',
+                        help="Never generate two cards with the same phrases")
+    parser.add_argument('--max-line-overlap', type=int,
+                        help="Maximum number of phrases two cards may share on a winning line")
+    return parser.parse_args()
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python3 bingo.py <language> <number_of_cards>")
-        sys.exit(1)
-    
-    language = sys.argv[1]
-    try:
-        num_cards = int(sys.argv[2])
-    except ValueError:
-        print("Error: Number of cards must be an integer")
+    args = parse_args()
+
+    output_format = args.format
+    if output_format is None:
+        output_format = 'ndjson' if args.output and args.output.endswith('.ndjson') else 'json'
+    filename = args.output or f"{os.path.splitext(os.path.basename(args.workbook))[0]}.{output_format}"
+
+    # Read by path, so the workbook is not loaded into memory as a whole
+    bingo_data, error = extract_bingo_data(args.workbook)
+    if error:
+        print(f"Error: {error}")
         sys.exit(1)
 
-    cards = generate_cards(language, num_cards)
-    save_cards_to_json(cards, language)
+    cards, error = iter_cards(
+        bingo_data,
+        cards_per_quest=args.cards_per_quest,
+        unique_across_cards=args.unique,
+        seed=args.seed,
+        workers=args.workers,
+        languages=parse_languages(args.languages or '') or None,
+        missing_translation=args.missing_translation,
+        distinct_cards=args.distinct,
+        max_line_overlap=args.max_line_overlap
+    )
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
 
-    # Save to JSON
-    print(f"Successfully generated {num_cards} bingo card(s) in {language}.json")
-        
+    # Written next to the output and renamed when complete, so a failed
+    # run does not leave a truncated file behind
+    partial_filename = f"{filename}.partial"
+    try:
+        with open(partial_filename, 'w', encoding='utf-8') as file:
+            count = write_cards(cards, file, output_format)
+    except CardConstraintError as e:
+        os.remove(partial_filename)
+        print(f"Error: {e}")
+        sys.exit(1)
+    except BaseException:
+        os.remove(partial_filename)
+        raise
+    os.replace(partial_filename, filename)
+    print(f"Successfully generated {count} bingo card(s) in {filename}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from typing import Dict, Tuple
+import threading
+import time
+from schemas import BingoData
+from phrase_index import get_phrase_index
+
+def compact_dataset(data: BingoData) -> BingoData:
+    """
+    Return a copy of the data for generating cards only.
+
+    The copy keeps the quests and difficulties and the phrase index of the data,
+    built now if needed, but not the Phrase models: the index holds every text once
+    in plain lists, which is all the card generators, the planner and the print
+    renderer read. The copy has no phrases of its own, so it must not be indexed again.
+    """
+    index = get_phrase_index(data)
+    compact = BingoData.model_construct(quests=data.quests, phrases=[], difficulties=data.difficulties)
+    compact._phrase_index = index
+    compact._print_renderer = data._print_renderer
+    return compact
+
+class DatasetRegistry:
+    """
+    In-process store of registered datasets by ID, kept apart from the workbook cache
+    so one-off uploads cannot evict them.
+
+    Datasets are dropped once unused for `ttl` seconds, every access restarts the
+    clock, and the least recently used are dropped beyond `max_datasets`.
+    """
+
+    def __init__(self, max_datasets: int = 64, ttl: float = 3600):
+        self.max_datasets = max_datasets
+        self.ttl = ttl
+        self._datasets: OrderedDict[str, Tuple[BingoData, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, dataset_id: str, data: BingoData) -> BingoData:
+        """Store the compact form of the data under the ID and return it"""
+        compact = compact_dataset(data)
+        with self._lock:
+            self._datasets.pop(dataset_id, None)
+            self._datasets[dataset_id] = (compact, time.monotonic())
+            self._expire()
+            while len(self._datasets) > self.max_datasets:
+                del self._datasets[next(iter(self._datasets))]
+        return compact
+
+    def get(self, dataset_id: str) -> BingoData | None:
+        with self._lock:
+            entry = self._datasets.get(dataset_id)
+            if entry is None:
+                return None
+            data, used_at = entry
+            now = time.monotonic()
+            if now - used_at > self.ttl:
+                del self._datasets[dataset_id]
+                return None
+            self._datasets[dataset_id] = (data, now)
+            self._datasets.move_to_end(dataset_id)
+            return data
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'datasets': len(self._datasets)}
+
+    def _expire(self) -> None:
+        """Drop datasets unused for more than ttl seconds. Caller holds the lock"""
+        cutoff = time.monotonic() - self.ttl
+        # Least recently used first, so expired datasets are at the front
+        while self._datasets:
+            dataset_id, (_, used_at) = next(iter(self._datasets.items()))
+            if used_at >= cutoff:
+                break
+            del self._datasets[dataset_id]
+
+if __name__ == '__main__':
+    import unittest
+    from unittest import mock
+    from generate_cards import generate_cards
+    from schemas import Phrase, Quest, Translation
+
+    class TestDatasetRegistry(unittest.TestCase):
+        def make_data(self, name: str = "Quest") -> BingoData:
+            phrases = [
+                Phrase(translations=[Translation(language="english", text=f"phrase {i}")],
+                       type="t", difficulty="easy")
+                for i in range(30)
+            ]
+            return BingoData(quests=[Quest(name=name, language="english", types=["t"])],
+                             phrases=phrases, difficulties=["easy"] * 25)
+
+        def test_compact_data_generates(self):
+            data = self.make_data()
+            compact = compact_dataset(data)
+            self.assertEqual(compact.phrases, [])
+            self.assertIs(get_phrase_index(compact), get_phrase_index(data))
+            self.assertEqual(generate_cards(compact, seed=1), generate_cards(data, seed=1))
+
+        def test_access_refreshes_ttl(self):
+            registry = DatasetRegistry(ttl=10)
+            with mock.patch('time.monotonic', return_value=0):
+                registry.register('a', self.make_data())
+            for now in (8, 16, 24):
+                with mock.patch('time.monotonic', return_value=now):
+                    self.assertIsNotNone(registry.get('a'))
+            with mock.patch('time.monotonic', return_value=35):
+                self.assertIsNone(registry.get('a'))
+            self.assertEqual(registry.stats(), {'datasets': 0})
+
+        def test_least_recently_used_is_dropped(self):
+            registry = DatasetRegistry(max_datasets=2)
+            registry.register('a', self.make_data())
+            registry.register('b', self.make_data())
+            registry.get('a')
+            registry.register('c', self.make_data())
+            self.assertIsNotNone(registry.get('a'))
+            self.assertIsNone(registry.get('b'))
+
+    unittest.main()
@@ -1,143 +1,283 @@
-from typing import List
+from typing import BinaryIO, Dict, List
+import math
+import os
 from pydantic import ValidationError
-from schemas import BingoData, Quest, Phrase
+from schemas import BingoData, Quest, Phrase, Translation
 from io import BytesIO
 from openpyxl import load_workbook
+import metrics
 
-def extract_bingo_data(file_content: bytes) -> tuple[BingoData | None, str | None]:
+TYPES_HEADER = 'types (order matters! first ones are filled first)'
+TRANSLATION_PREFIX = 'translation-'
+
+def extract_bingo_data(
+    file_content: bytes | str | os.PathLike | BinaryIO
+) -> tuple[BingoData | None, str | None]:
     """
     Extract and validate data from Excel file content.
     Args:
-        file_content: Raw bytes of the Excel file
+        file_content: Raw bytes of the Excel file, or a path or binary file object to
+            read it from, which openpyxl reads without holding the whole file in memory
     Returns:
         A tuple of (validated_data, error) where validated_data is a BingoData instance
         and error is an error message string if any error occurred.
     """
-    
-    required_sheets = ['quests', 'phrases', 'pattern']
-    
+
     try:
-        # Load workbook from bytes
-        wb = load_workbook(filename=BytesIO(file_content), read_only=True, data_only=True)
-        
-        # Check for required sheets
-        missing_sheets = [sheet for sheet in required_sheets if sheet not in wb.sheetnames]
-        if missing_sheets:
-            return None, f"Missing sheets: {', '.join(missing_sheets)}"
-        
-        # Process each sheet
-        processed_data = {
-            'quests': [],
-            'phrases': [],
-            'difficulties': []
-        }
-
-        def process_quest_row(headers, row):
-            row_data = {}
-            types_header = 'types (order matters! first ones are filled first)'
-            
-            for header, cell in zip(headers, row):
-                if header:
-                    value = cell.value if cell.value is not None else ''
-                    if header == types_header and value:
-                        value = [t.strip() for t in str(value).split(';') if t.strip()]
-                    row_data[header.replace(types_header, 'types')] = value
-            return row_data
-
-        def process_phrase_row(headers, row):
-            translations = []
-            other_fields = {}
-            for header, cell in zip(headers, row):
-                value = cell.value if cell.value is not None else ''
-                if header.startswith('translation-'):
-                    if value and str(value).strip():  # Only include non-empty translations
-                        language = header.replace('translation-', '')
-                        translations.append({
-                            'language': language,
-                            'text': str(value).strip()
-                        })
-                else:
-                    other_fields[header] = value
-            return {**other_fields, 'translations': translations}
-
-        def process_pattern_sheet(ws):
-            """Process pattern sheet as 5x5 grid of difficulty values"""
-            difficulties = []
-            
-            # Process all 5 rows (no header)
-            for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=5), start=1):
-                # Get first 5 values from the row
-                for cell in row[:5]:
-                    value = cell.value if cell.value is not None else ''
-                    difficulties.append(str(value).strip())
-
-            if len(difficulties) != 25:
-                return None, f"Board must contain exactly 25 fields (found {len(difficulties)})"
-                
-            return difficulties, None
-
-        def is_row_valid(row, headers, required_field=None):
-            if not required_field:
-                # If no specific field required, check first column
-                return row[0].value is not None and str(row[0].value).strip() != ''
-            
-            # Find the required field in headers and check its value
-            for header, cell in zip(headers, row):
-                if header == required_field:
-                    return cell.value is not None and str(cell.value).strip() != ''
-            return False
-
-        def process_sheet(sheet_name, process_row_func, required_field=None):
-            ws = wb[sheet_name]
-            headers = [str(cell.value) for cell in next(ws.rows) if cell.value is not None]
-            
-            processed_rows = []
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2), start=2):
-                if is_row_valid(row, headers, required_field):
-                    row_data = process_row_func(headers, row)
-                    if row_data:
-                        processed_rows.append(row_data)
-            return processed_rows
-
-        # Process quests and phrases
-        processed_data['quests'] = process_sheet('quests', process_quest_row, 'name')
-        processed_data['phrases'] = process_sheet('phrases', process_phrase_row, 'difficulty')
-
-        # Board processing results
+        if isinstance(file_content, (bytes, bytearray)):
+            file_content = BytesIO(file_content)
+        with metrics.timed('workbook_open'):
+            wb = load_workbook(filename=file_content, read_only=True, data_only=True)
+        try:
+            return process_workbook(wb)
+        finally:
+            # Read-only workbooks keep the file open until closed
+            wb.close()
+
+    except Exception as e:
+        import traceback
+        return None, f"Error: {str(e)}\n{traceback.format_exc()}"
+
+def process_workbook(wb) -> tuple[BingoData | None, str | None]:
+    """Read and validate the sheets of an opened workbook"""
+    required_sheets = ['quests', 'phrases', 'pattern']
+
+    # Check for required sheets
+    missing_sheets = [sheet for sheet in required_sheets if sheet not in wb.sheetnames]
+    if missing_sheets:
+        return None, f"Missing sheets: {', '.join(missing_sheets)}"
+
+    # The pattern is checked first, its errors are reported before row errors
+    with metrics.timed('pattern_sheet'):
         difficulties, error = process_pattern_sheet(wb['pattern'])
-        if error:
-            return None, error
-        processed_data['difficulties'] = difficulties
+    if error:
+        return None, error
+
+    with metrics.timed('quest_sheet'):
+        quests, error = process_quest_sheet(wb['quests'])
+    if error:
+        return None, error
+
+    # Rows are validated as they are read, this covers both
+    with metrics.timed('phrase_sheet'):
+        phrases, error = process_phrase_sheet(wb['phrases'])
+    if error:
+        return None, error
+    metrics.observe(metrics.WORKBOOK_PHRASES, len(phrases))
+
+    # Every part is validated already, skip validating it all again
+    return BingoData.model_construct(
+        quests=quests,
+        phrases=phrases,
+        difficulties=difficulties
+    ), None
+
+def process_pattern_sheet(ws):
+    """Process pattern sheet as 5x5 grid of difficulty values"""
+    difficulties = []
+
+    # Process all 5 rows (no header)
+    for row in ws.iter_rows(min_row=1, max_row=5, values_only=True):
+        # Get first 5 values from the row
+        for value in row[:5]:
+            difficulties.append(str(value if value is not None else '').strip())
+
+    if len(difficulties) != 25:
+        return None, f"Board must contain exactly 25 fields (found {len(difficulties)})"
+
+    return difficulties, None
+
+def read_sheet(ws, required_field):
+    """
+    Read the header of a sheet and stream its data rows.
+    Returns:
+        A tuple of (columns, rows) where columns maps each header to its column index
+        and rows yields (row_number, row_values) for the rows that have a value in the
+        required column
+    """
+    rows = ws.iter_rows(values_only=True)
+    header_row = next(rows, ())
+    columns: Dict[str, int] = {
+        str(header): col for col, header in enumerate(header_row) if header is not None
+    }
+    return columns, iter_valid_rows(rows, len(header_row), columns.get(required_field))
+
+def iter_valid_rows(rows, width, required_col):
+    if required_col is None:
+        return
+
+    for row_number, row in enumerate(rows, start=2):
+        if len(row) < width:
+            row = row + (None,) * (width - len(row))
+        value = row[required_col]
+        if value is None or str(value).strip() == '':
+            continue
+        yield row_number, row
+
+def process_quest_sheet(ws) -> tuple[List[Quest] | None, str | None]:
+    columns, rows = read_sheet(ws, 'name')
+    fields = [
+        ('types' if header == TYPES_HEADER else header, col)
+        for header, col in columns.items()
+    ]
+
+    quests = []
+    for row_number, row in rows:
+        row_data = {}
+        for field, col in fields:
+            value = row[col] if row[col] is not None else ''
+            if field == 'types' and value:
+                value = [t.strip() for t in str(value).split(';') if t.strip()]
+            row_data[field] = value
 
-        # Validate all data at once
         try:
-            validated_data = BingoData(
-                quests=processed_data['quests'],
-                phrases=processed_data['phrases'],
-                difficulties=processed_data['difficulties']
-            )
-            return validated_data, None
+            quests.append(Quest.model_validate(row_data))
         except ValidationError as e:
-            # Get the first validation error
-            error = e.errors()[0]
-            location = error['loc']
-            
-            if len(location) >= 2:
-                data_type = location[0]  # quests, phrases, or difficulties
-                index = location[1] if isinstance(location[1], int) else None
-                field = '.'.join(str(loc) for loc in location[2:]) if len(location) > 2 else None
-                
-                error_msg = f"{data_type.capitalize()} "
-                if index is not None:
-                    error_msg += f"(row {index + 2}) "  # +2 because of header row and 0-based index
-                if field:
-                    error_msg += f"field '{field}' "
-                error_msg += error['msg']
-            else:
-                error_msg = f"Validation error: {error['msg']}"
-            
-            return None, error_msg
-            
-    except Exception as e:
-        import traceback
-        return None, f"Error: {str(e)}\n{traceback.format_exc()}"
\ No newline at end of file
+            return None, format_validation_error('quests', row_number, e)
+    return quests, None
+
+def process_phrase_sheet(ws) -> tuple[List[Phrase] | None, str | None]:
+    columns, rows = read_sheet(ws, 'difficulty')
+    translation_cols = [
+        (header[len(TRANSLATION_PREFIX):], col)
+        for header, col in columns.items() if header.startswith(TRANSLATION_PREFIX)
+    ]
+    field_cols = [
+        (header, col)
+        for header, col in columns.items() if not header.startswith(TRANSLATION_PREFIX)
+    ]
+    difficulty_col = columns.get('difficulty')
+    type_col = columns.get('type')
+    weight_col = columns.get('weight')
+
+    phrases = []
+    for row_number, row in rows:
+        translations = []
+        for language, col in translation_cols:
+            value = row[col]
+            if value:
+                text = str(value).strip()
+                if text:  # Only include non-empty translations
+                    translations.append(Translation.model_construct(language=language, text=text))
+
+        difficulty = row[difficulty_col]
+        phrase_type = None  # Missing column, reported by Pydantic below
+        if type_col is not None:
+            phrase_type = row[type_col] if row[type_col] is not None else ''
+        # Optional column, an empty cell means the default weight
+        weight = row[weight_col] if weight_col is not None else None
+        if weight == '':
+            weight = None
+        if (isinstance(difficulty, str) and isinstance(phrase_type, str) and
+                (weight is None or type(weight) in (int, float) and 0 < weight < math.inf)):
+            phrases.append(Phrase.model_construct(
+                translations=translations,
+                difficulty=difficulty,
+                type=phrase_type,
+                weight=1.0 if weight is None else float(weight)
+            ))
+            continue
+
+        # Let Pydantic decide on anything else, so errors name the field
+        row_data = {header: row[col] if row[col] is not None else '' for header, col in field_cols}
+        if weight is None:
+            row_data.pop('weight', None)
+        row_data['translations'] = translations
+        try:
+            phrases.append(Phrase.model_validate(row_data))
+        except ValidationError as e:
+            return None, format_validation_error('phrases', row_number, e)
+    return phrases, None
+
+def format_validation_error(data_type: str, row_number: int, e: ValidationError) -> str:
+    """Describe the first validation error of a sheet row"""
+    # Get the first validation error
+    error = e.errors()[0]
+    field = '.'.join(str(loc) for loc in error['loc'])
+
+    error_msg = f"{data_type.capitalize()} (row {row_number}) "
+    if field:
+        error_msg += f"field '{field}' "
+    return error_msg + error['msg']
+
+if __name__ == '__main__':
+    import unittest
+    from openpyxl import Workbook
+
+    class TestExtractBingoData(unittest.TestCase):
+        def make_workbook(self, phrase_rows, quest_rows=(("Quest", "english", "t1; t2"),), pattern=None) -> bytes:
+            wb = Workbook()
+            quests = wb.active
+            quests.title = 'quests'
+            quests.append(['name', 'language', TYPES_HEADER])
+            for row in quest_rows:
+                quests.append(list(row))
+            phrases = wb.create_sheet('phrases')
+            phrases.append(['difficulty', 'type', 'weight', 'translation-english', 'translation-finnish'])
+            for row in phrase_rows:
+                phrases.append(list(row))
+            pattern_sheet = wb.create_sheet('pattern')
+            for row in pattern or [["easy"] * 5] * 5:
+                pattern_sheet.append(list(row))
+            content = BytesIO()
+            wb.save(content)
+            return content.getvalue()
+
+        def test_fast_path(self):
+            data, error = extract_bingo_data(self.make_workbook([
+                ("easy", "t1", None, " Hello ", "Hei"),
+                ("hard", "t2", 2.5, "Bye", None),
+            ]))
+            self.assertIsNone(error)
+            self.assertEqual(data.difficulties, ["easy"] * 25)
+            self.assertEqual(data.quests, [Quest(name="Quest", language="english", types=["t1", "t2"])])
+            self.assertEqual(data.phrases, [
+                Phrase(translations=[Translation(language="english", text="Hello"),
+                                     Translation(language="finnish", text="Hei")],
+                       difficulty="easy", type="t1"),
+                Phrase(translations=[Translation(language="english", text="Bye")],
+                       difficulty="hard", type="t2", weight=2.5),
+            ])
+
+        def test_validation_errors_name_row_and_field(self):
+            # Row 3 is blank and skipped, the rows after it keep their sheet numbers
+            _, error = extract_bingo_data(self.make_workbook([
+                ("easy", "t1", None, "Hello", None),
+                (None, None, None, None, None),
+                ("easy", "t1", -1, "Bye", None),
+            ]))
+            self.assertEqual(error, "Phrases (row 4) field 'weight' Input should be greater than 0")
+
+            _, error = extract_bingo_data(self.make_workbook([("easy", "t1", None, "Hello", None), (3, "t1")]))
+            self.assertEqual(error, "Phrases (row 3) field 'difficulty' Input should be a valid string")
+
+            _, error = extract_bingo_data(self.make_workbook([], quest_rows=[("Quest", 5, "t1")]))
+            self.assertEqual(error, "Quests (row 2) field 'language' Input should be a valid string")
+
+        def test_short_and_blank_rows(self):
+            data, error = extract_bingo_data(self.make_workbook([
+                ("easy", "t1"),
+                (None,),
+                ("", "t2", None, "Skipped"),
+                ("hard", "t2", None, "Kept"),
+            ]))
+            self.assertIsNone(error)
+            self.assertEqual([(p.difficulty, p.type, p.translations) for p in data.phrases], [
+                ("easy", "t1", []),
+                ("hard", "t2", [Translation(language="english", text="Kept")]),
+            ])
+            # Rows shorter than the header are padded
+            rows = list(iter_valid_rows(iter([("easy",), (), ("hard", "t")]), 3, 0))
+            self.assertEqual(rows, [(2, ("easy", None, None)), (4, ("hard", "t", None))])
+
+        def test_workbook_errors(self):
+            _, error = extract_bingo_data(self.make_workbook([], pattern=[["easy"] * 5] * 4))
+            self.assertEqual(error, "Board must contain exactly 25 fields (found 20)")
+            wb = Workbook()
+            wb.active.title = 'quests'
+            content = BytesIO()
+            wb.save(content)
+            _, error = extract_bingo_data(content.getvalue())
+            self.assertEqual(error, "Missing sheets: phrases, pattern")
+
+    unittest.main()
@@ -1,125 +1,791 @@
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Iterator, Tuple, Set
 from schemas import BingoData, Translation, BingoCard, Quest, Phrase
+from phrase_index import get_phrase_index, MISSING_TRANSLATION_POLICIES, WeightedPool
+from weighted_sampling import AliasTable, weighted_permutations, weighted_sample, weighted_sample_rows
+from card_signatures import CardConstraintError, CardSignatures
+from winners import winning_lines
+import metrics
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import hashlib
+import math
+import multiprocessing
 import random
+import threading
+import numpy as np
 
-def generate_cards(data: BingoData, shuffle: bool = True) -> tuple[List[Dict[str, any]] | None, str | None]:
+# Upper bound for the number of random keys drawn at once when sampling a batch
+BATCH_KEYS_LIMIT = 1_000_000
+# Number of independent cards of a quest sampled per batch
+BATCH_CHUNK_SIZE = 1000
+# Number of times a card breaking the duplicate or overlap constraints is redrawn
+MAX_REDRAWS = 1000
+# Seed sequence position of the redraw stream of a quest, past any chunk index
+REDRAW_STREAM = 2**32 - 1
+# Fewest cards in total for which batches are sent to worker processes, smaller
+# generations finish sooner than the round trips to the workers
+PARALLEL_MIN_CARDS = 100_000
+
+def generate_cards(
+    data: BingoData,
+    shuffle: bool = True,
+    cards_per_quest: int = 1,
+    unique_across_cards: bool = False,
+    seed: int | None = None,
+    workers: int = 1,
+    languages: List[str] | None = None,
+    missing_translation: str = 'require',
+    distinct_cards: bool = False,
+    max_line_overlap: int | None = None
+) -> tuple[List[Dict[str, any]] | None, str | None]:
     """
     Generate bingo cards based on the provided data.
     
     Args:
         data: BingoData containing quests, phrases and difficulties pattern
         shuffle: Whether to shuffle the phrases or maintain order (for testing)
+        cards_per_quest: Number of cards to generate for each quest. Batches of more
+            than one card are sampled with NumPy in one go per quest
+        unique_across_cards: If True, a phrase is not reused between the cards of a
+            quest until its pool runs out. Otherwise phrases only stay unique within a card
+        seed: Master seed, the same seed gives the same cards for any number of workers.
+            Drawn from the random module if not given
+        workers: Number of processes to generate with. If more than 1, the batches of
+            generations of at least PARALLEL_MIN_CARDS cards are spread over a process pool
+        languages: If given, each card is drawn once as a layout of phrases and
+            projected into every one of these languages, instead of only the quest's
+            language. The cards of one layout share a 'layout' number
+        missing_translation: What to do with phrases lacking a translation to one of
+            the languages: 'require' draws only fully translated phrases, 'fallback'
+            uses the quest language text and 'error' fails
+        distinct_cards: If True, no two cards share the same phrase set (layouts
+            when projected into languages). Repeats are redrawn
+        max_line_overlap: If given, no two cards share more than this many phrases
+            on a winning line, comparing every line of one with every line of the
+            other. Implies distinct_cards for boards with lines longer than this.
+            Neither can be combined with unique_across_cards
         
     Returns:
         Tuple of (cards, error) where:
         - cards is a list of dicts with quest name and card content if successful, None if failed
         - error is a string describing the error if failed, None if successful
     """
-    cards = []
+    cards, error = iter_cards(
+        data, shuffle, cards_per_quest, unique_across_cards, seed, workers,
+        languages, missing_translation, distinct_cards, max_line_overlap
+    )
+    if error:
+        return None, error
+    try:
+        with metrics.timed('generation'):
+            cards = list(cards)
+    except CardConstraintError as e:
+        return None, str(e)
+    metrics.count(metrics.CARDS, len(cards))
+    return cards, None
+
+def iter_cards(
+    data: BingoData,
+    shuffle: bool = True,
+    cards_per_quest: int = 1,
+    unique_across_cards: bool = False,
+    seed: int | None = None,
+    workers: int = 1,
+    languages: List[str] | None = None,
+    missing_translation: str = 'require',
+    distinct_cards: bool = False,
+    max_line_overlap: int | None = None
+) -> tuple[Iterator[Dict[str, any]] | None, str | None]:
+    """
+    Generator form of generate_cards, for streaming cards as they are produced.
     
-    for quest in data.quests:
-        phrase_pools: Dict[str, Dict[str, List[str]]] = {}
+    Every quest is checked before the iterator is returned, so errors are reported
+    up front and not halfway through a stream. The one exception is a card that
+    cannot be redrawn to meet distinct_cards or max_line_overlap, which raises
+    CardConstraintError while iterating. Arguments are the same as for generate_cards.
         
-        # Initialize pools for each phrase type
-        for phrase_type in quest.types:
-            phrase_pools[phrase_type] = {}
-            type_phrases = [q for q in data.phrases if q.type == phrase_type]
-            
-            for q in type_phrases:
-                valid_translations = [
-                    trans.text 
-                    for trans in q.translations 
-                    if trans.language == quest.language
-                ]
-                if valid_translations:
-                    if q.difficulty not in phrase_pools[phrase_type]:
-                        phrase_pools[phrase_type][q.difficulty] = []
-                    phrase_pools[phrase_type][q.difficulty].extend(valid_translations)
-
-        # Count needed phrases by difficulty
-        needed_by_difficulty = {}
-        for diff in data.difficulties:
-            if diff not in needed_by_difficulty:
-                needed_by_difficulty[diff] = 0
-            needed_by_difficulty[diff] += 1
-            
-        # Check availability before starting to fill card
-        for required_difficulty in needed_by_difficulty:
-            total_available = sum(
-                len(phrase_pools.get(qtype, {}).get(required_difficulty, []))
-                for qtype in quest.types
+    Returns:
+        Tuple of (cards, error) where:
+        - cards is an iterator over the dicts generate_cards returns, None if failed
+        - error is a string describing the error if failed, None if successful
+    """
+    if cards_per_quest < 1:
+        return None, f"Number of cards per quest must be at least 1 (got {cards_per_quest})"
+    if seed is not None and seed < 0:
+        return None, f"Seed must be a non-negative integer (got {seed})"
+    if missing_translation not in MISSING_TRANSLATION_POLICIES:
+        return None, f"Unknown missing translation policy '{missing_translation}'"
+    if max_line_overlap is not None and max_line_overlap < 0:
+        return None, f"Maximum line overlap must be a non-negative integer (got {max_line_overlap})"
+    if unique_across_cards and (distinct_cards or max_line_overlap is not None):
+        return None, (
+            "Unique phrases across cards cannot be combined with distinct cards or a maximum "
+            "line overlap: cards redrawn to meet those would reuse phrases."
+        )
+
+    index = get_phrase_index(data)
+    positions_by_difficulty = group_positions_by_difficulty(data.difficulties)
+    
+    quest_pools = []
+    for quest in data.quests:
+        if languages:
+            phrase_pools = index.concept_pools(
+                quest.language, quest.types, positions_by_difficulty, languages, missing_translation
+            )
+            if missing_translation == 'error':
+                missing = index.missing_translations(phrase_pools, languages)
+                if missing:
+                    counts = ", ".join(f"{language}: {count}" for language, count in missing.items())
+                    return None, (
+                        f"Could not generate aligned bingo cards for quest {quest.name}: "
+                        f"phrases without translation by language: {counts}."
+                    )
+            description = "phrases"
+            if missing_translation == 'require':
+                description = f"phrases translated to {', '.join(languages)}"
+        else:
+            phrase_pools = index.quest_pools(quest.language, quest.types, positions_by_difficulty)
+            description = None
+
+        error = check_availability(quest, phrase_pools, positions_by_difficulty, description)
+        if not error and (distinct_cards or max_line_overlap is not None):
+            error = check_distinct_cards(
+                quest, phrase_pools, positions_by_difficulty, cards_per_quest,
+                shuffle, description
             )
-            if total_available < needed_by_difficulty[required_difficulty]:
-                by_type = {
-                    qtype: len(phrase_pools.get(qtype, {}).get(required_difficulty, []))
-                    for qtype in quest.types
-                }
-                type_counts = ", ".join(f"{qtype}: {count}" for qtype, count in by_type.items())
-                or_types = "' or '".join(quest.types)
-                return None, (
-                    f"Could not generate a bingo card for quest {quest.name}: "
-                    f"not enough {quest.language} phrases with difficulty '{required_difficulty}' and type '{or_types}'. "
-                    f"{needed_by_difficulty[required_difficulty]} required, available by type: {type_counts}."
+        if not error and max_line_overlap is not None:
+            error = check_line_overlap(
+                quest, phrase_pools, data.difficulties, cards_per_quest,
+                max_line_overlap, description
+            )
+        if error:
+            return None, error
+        quest_pools.append(phrase_pools)
+    
+    generation = _Generation(
+        quest_pools, positions_by_difficulty, len(data.difficulties),
+        shuffle, cards_per_quest, unique_across_cards
+    )
+    if seed is None:
+        # Drawn from the random module so random.seed() still reproduces the output
+        seed = random.getrandbits(64)
+    
+    generated = _iter_generated(generation, seed, workers)
+    if distinct_cards or max_line_overlap is not None:
+        try:
+            signatures = CardSignatures(data.difficulties, distinct_cards, max_line_overlap)
+        except ValueError as e:
+            return None, str(e)
+        generated = _iter_constrained(generated, generation, signatures, seed, data.quests)
+    if languages:
+        return _iter_projected(generated, data.quests, index.texts, languages), None
+    return (
+        {'quest': data.quests[quest_index].name, 'card': card}
+        for quest_index, card in generated
+    ), None
+
+def _iter_projected(
+    generated: Iterator[Tuple[int, List[int]]],
+    quests: List[Quest],
+    texts: List[Dict[str, str]],
+    languages: List[str]
+) -> Iterator[Dict[str, any]]:
+    """Turn layouts of phrase IDs into one card per language, falling back to the quest language"""
+    layout_numbers = [0] * len(quests)
+    for quest_index, layout in generated:
+        quest = quests[quest_index]
+        layout_number = layout_numbers[quest_index]
+        layout_numbers[quest_index] += 1
+        for language in languages:
+            yield {
+                'quest': quest.name,
+                'language': language,
+                'layout': layout_number,
+                'card': [
+                    texts[phrase_id].get(language) or texts[phrase_id][quest.language]
+                    for phrase_id in layout
+                ]
+            }
+
+def _iter_constrained(
+    generated: Iterator[Tuple[int, List]],
+    generation: '_Generation',
+    signatures: CardSignatures,
+    seed: int,
+    quests: List[Quest]
+) -> Iterator[Tuple[int, List]]:
+    """
+    Pass on the cards that meet the constraints of the signatures, redrawing the others.
+    
+    Redraws come from a stream per quest derived from the master seed, so the output
+    stays reproducible. They are independent single cards, not part of the batch.
+    """
+    redraw_rngs = {}
+    card_numbers = [0] * len(quests)
+    for quest_index, card in generated:
+        card_numbers[quest_index] += 1
+        redraws = 0
+        while not signatures.add(card):
+            if redraws == MAX_REDRAWS:
+                quest = quests[quest_index]
+                limit = "the same phrases as"
+                if signatures.subset_size is not None:
+                    limit = f"more than {signatures.subset_size - 1} phrases on a line with"
+                raise CardConstraintError(
+                    f"Could not generate bingo card {card_numbers[quest_index]} of "
+                    f"{generation.cards_per_quest} for quest {quest.name}: "
+                    f"{MAX_REDRAWS} redrawn cards all shared {limit} an earlier card. "
+                    f"Add phrases or generate fewer cards."
                 )
+            if quest_index not in redraw_rngs:
+                seed_sequence = np.random.SeedSequence([seed, quest_index, REDRAW_STREAM])
+                redraw_rngs[quest_index] = random.Random(int(seed_sequence.generate_state(1, np.uint64)[0]))
+            card = generation.redraw(quest_index, redraw_rngs[quest_index])
+            redraws += 1
+        yield quest_index, card
 
-        # Prepare card with empty slots
-        card_size = len(data.difficulties)
-        card = [None] * card_size
+def _iter_generated(
+    generation: '_Generation',
+    seed: int,
+    workers: int
+) -> Iterator[Tuple[int, List]]:
+    """Run the tasks of a generation, yielding (quest_index, card) in task order"""
+    tasks = list(generation.tasks(seed))
+    total_cards = len(generation.quest_pools) * generation.cards_per_quest
+    if workers > 1 and generation.cards_per_quest > 1 and len(tasks) > 1 and total_cards >= PARALLEL_MIN_CARDS:
+        results = _run_in_pool(generation, tasks, workers)
+    else:
+        results = (generation.run(task) for task in tasks)
+    
+    for (quest_index, _, _), result in zip(tasks, results):
+        for card in generation.cards(quest_index, result):
+            yield quest_index, card
+
+class _Generation:
+    """
+    Read-only state of one generation, split into independently seeded tasks of
+    (quest_index, card_count, seed).
+    
+    Task seeds are derived from the master seed and the task position, so results
+    do not depend on where a task runs. Batch tasks only need the quest's sampling
+    plan, not its phrases, so that is all a worker process receives.
+    """
+    
+    def __init__(
+        self,
+        quest_pools: List[Dict[str, List[List[str]]]],
+        positions_by_difficulty: Dict[str, List[int]],
+        card_size: int,
+        shuffle: bool,
+        cards_per_quest: int,
+        unique_across_cards: bool
+    ):
+        self.quest_pools = quest_pools
+        self.positions_by_difficulty = positions_by_difficulty
+        self.card_size = card_size
+        self.shuffle = shuffle
+        self.cards_per_quest = cards_per_quest
+        self.unique_across_cards = unique_across_cards
+        self.tables = []
+        if cards_per_quest > 1:
+            self.tables = [_batch_table(pools, positions_by_difficulty) for pools in quest_pools]
+    
+    def chunk_size(self, quest_index: int) -> int:
+        """Number of cards per task of a quest"""
+        if not self.unique_across_cards or self.cards_per_quest == 1:
+            return BATCH_CHUNK_SIZE
+        _, plan = self.tables[quest_index]
+        return _unique_chunk_size(plan, self.positions_by_difficulty)
+    
+    def tasks(self, seed: int) -> Iterator[Tuple[int, int, int]]:
+        """Split the work into (quest_index, card_count, task_seed) tasks in output order"""
+        # Cards are drawn in chunks, so the first ones are ready early, jobs can
+        # report progress and large batches spread over workers
+        for quest_index in range(len(self.quest_pools)):
+            chunk_size = self.chunk_size(quest_index)
+            for chunk_index, start in enumerate(range(0, self.cards_per_quest, chunk_size)):
+                seed_sequence = np.random.SeedSequence([seed, quest_index, chunk_index])
+                task_seed = int(seed_sequence.generate_state(1, np.uint64)[0])
+                yield quest_index, min(chunk_size, self.cards_per_quest - start), task_seed
+    
+    def run(self, task: Tuple[int, int, int]):
+        """
+        Draw the cards of a task.
         
-        # Group positions by difficulty for random assignment
-        positions_by_difficulty = {}
-        for pos, diff in enumerate(data.difficulties):
-            if diff not in positions_by_difficulty:
-                positions_by_difficulty[diff] = []
-            positions_by_difficulty[diff].append(pos)
-
-        # Fill card with phrases
-        for difficulty in needed_by_difficulty:
-            # Get all positions for this difficulty
-            difficulty_positions = positions_by_difficulty[difficulty].copy()
-            
-            # For each position of this difficulty
-            while difficulty_positions:
-                if shuffle:
-                    # Choose a random position for this difficulty
-                    position = random.choice(difficulty_positions)
-                else:
-                    # Take the first position in testing mode
-                    position = difficulty_positions[0]
-                difficulty_positions.remove(position)
-                
-                # Try each type in order of preference (quest.types order)
-                phrase_found = False
-                for phrase_type in quest.types:
-                    if (phrase_type in phrase_pools and 
-                        difficulty in phrase_pools[phrase_type] and 
-                        phrase_pools[phrase_type][difficulty]):
-                        phrases = phrase_pools[phrase_type][difficulty]
-                        if shuffle:
-                            selected = random.choice(phrases)
-                        else:
-                            selected = phrases[0]
-                        phrases.remove(selected)
-                        card[position] = selected
-                        phrase_found = True
-                        break
-                
-                if not phrase_found:
-                    raise RuntimeError(f"Failed to find phrase for {difficulty} despite availability check")
+        Returns:
+            The card for single cards, a (count x card_size) matrix of text table
+            indices for batches (cheaper to send back from a worker than strings)
+        """
+        quest_index, _, task_seed = task
+        if self.cards_per_quest == 1:
+            return _fill_card(
+                self.quest_pools[quest_index], self.positions_by_difficulty,
+                self.card_size, self.shuffle, random.Random(task_seed)
+            )
+        return _run_batch_task(self.batch_task(task))
+    
+    def batch_task(self, task: Tuple[int, int, int]) -> tuple:
+        """The arguments of _run_batch_task for a task of a batch generation"""
+        quest_index, count, task_seed = task
+        _, plan = self.tables[quest_index]
+        return (
+            plan, self.positions_by_difficulty, self.card_size, count,
+            self.shuffle, self.unique_across_cards, task_seed
+        )
+    
+    def redraw(self, quest_index: int, rng: random.Random) -> List[str]:
+        """Draw a single replacement card for a quest"""
+        return _fill_card(
+            self.quest_pools[quest_index], self.positions_by_difficulty,
+            self.card_size, self.shuffle, rng
+        )
+    
+    def cards(self, quest_index: int, result) -> List[List[str]]:
+        """Turn the result of a task into cards"""
+        if self.cards_per_quest == 1:
+            return [result]
+        texts, _ = self.tables[quest_index]
+        return texts[result].tolist()
 
-        # Verify no empty slots
-        if None in card:
-            raise RuntimeError("Card contains empty slots despite availability check")
-            
-        cards.append({
-            'quest': quest.name,
-            'card': card
-        })
+def _run_batch_task(batch_task: tuple) -> np.ndarray:
+    *arguments, task_seed = batch_task
+    return _sample_batch(*arguments, np.random.default_rng(task_seed))
+
+# Process pools by number of workers, shared by the generations of this process
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Return the pool of `workers` processes, starting it on first use.
     
-    return cards, None
+    Workers are started from a fork server where available instead of being forked
+    from this process, which may be running other threads such as request handlers
+    and background jobs.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(start_method)
+            )
+        return pool
+
+def _run_in_pool(generation: _Generation, tasks: List[Tuple[int, int, int]], workers: int):
+    """
+    Run batch tasks on the shared process pool and yield their results in task order.
+    
+    At most two tasks per worker are in flight at a time, the rest are cancelled
+    if the caller stops early.
+    """
+    pool = _get_pool(workers)
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.submit(_run_batch_task, generation.batch_task(task)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def numbered_card_seed(dataset_id: str, quest_index: int, number: int) -> int:
+    """Derive the seed of a numbered card from the dataset, quest and card number"""
+    key = f"{dataset_id}:{quest_index}:{number}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+def iter_numbered_cards(
+    data: BingoData,
+    dataset_id: str,
+    quest_index: int,
+    offset: int,
+    limit: int
+) -> tuple[Iterator[Dict[str, any]] | None, str | None]:
+    """
+    Generate cards number `offset` to `offset + limit - 1` of a quest.
+    
+    Every card is drawn with its own seed derived from the dataset ID (the workbook
+    hash), the quest and the card number, so any card can be produced again in
+    O(card size) without generating or storing the ones before it. Phrases are
+    unique within a card but may repeat between cards.
+    
+    Args:
+        data: BingoData containing quests, phrases and difficulties pattern
+        dataset_id: Identifier of the data, such as the hash of its workbook
+        quest_index: Index of the quest in data.quests
+        offset: Number of the first card
+        limit: Number of cards
+        
+    Returns:
+        Tuple of (cards, error) where:
+        - cards is an iterator over dicts with quest name, card number and card content, None if failed
+        - error is a string describing the error if failed, None if successful
+    """
+    if not 0 <= quest_index < len(data.quests):
+        return None, f"Quest {quest_index} does not exist, the data has {len(data.quests)} quests"
+    if offset < 0 or limit < 0:
+        return None, "Card numbers must not be negative"
+    
+    quest = data.quests[quest_index]
+    positions_by_difficulty = group_positions_by_difficulty(data.difficulties)
+    phrase_pools = get_phrase_index(data).quest_pools(quest.language, quest.types, positions_by_difficulty)
+    
+    error = check_availability(quest, phrase_pools, positions_by_difficulty)
+    if error:
+        return None, error
+    
+    def numbered_cards():
+        for number in range(offset, offset + limit):
+            rng = random.Random(numbered_card_seed(dataset_id, quest_index, number))
+            yield {
+                'quest': quest.name,
+                'number': number,
+                'card': _fill_card(phrase_pools, positions_by_difficulty, len(data.difficulties), True, rng)
+            }
+    
+    return numbered_cards(), None
+
+def group_positions_by_difficulty(difficulties: List[str]) -> Dict[str, List[int]]:
+    """Group card positions by difficulty, in order of first appearance"""
+    positions_by_difficulty = {}
+    for pos, diff in enumerate(difficulties):
+        if diff not in positions_by_difficulty:
+            positions_by_difficulty[diff] = []
+        positions_by_difficulty[diff].append(pos)
+    return positions_by_difficulty
+
+def check_availability(
+    quest: Quest,
+    phrase_pools: Dict[str, List[List[str]]],
+    positions_by_difficulty: Dict[str, List[int]],
+    description: str | None = None
+) -> str | None:
+    """
+    Check that a single card can be filled for the quest.
+    
+    Args:
+        description: What the pools hold, for the message. Defaults to the quest language phrases
+    
+    Returns:
+        An error message naming the first difficulty that falls short, None if all are available
+    """
+    for required_difficulty, positions in positions_by_difficulty.items():
+        needed = len(positions)
+        pools = phrase_pools[required_difficulty]
+        if sum(len(pool) for pool in pools) < needed:
+            # The pools hold each type once, in order of first appearance
+            types = list(dict.fromkeys(quest.types))
+            type_counts = ", ".join(f"{qtype}: {len(pool)}" for qtype, pool in zip(types, pools))
+            or_types = "' or '".join(types)
+            return (
+                f"Could not generate a bingo card for quest {quest.name}: "
+                f"not enough {description or f'{quest.language} phrases'} with difficulty '{required_difficulty}' and type '{or_types}'. "
+                f"{needed} required, available by type: {type_counts}."
+            )
+    return None
+
+def check_distinct_cards(
+    quest: Quest,
+    phrase_pools: Dict[str, List[List[str]]],
+    positions_by_difficulty: Dict[str, List[int]],
+    count: int,
+    shuffle: bool,
+    description: str | None = None
+) -> str | None:
+    """
+    Check that the pools of an available quest allow count cards with different phrase sets.
+    
+    Cards take a fixed number of phrases from each (type, difficulty) bucket, so the
+    number of different sets is the product of the binomial coefficients of the buckets.
+    
+    Returns:
+        An error message if there are fewer different sets than cards, None otherwise
+    """
+    possible = 1
+    if shuffle:
+        for difficulty, positions in positions_by_difficulty.items():
+            remaining = len(positions)
+            for phrases in phrase_pools[difficulty]:
+                take = min(remaining, len(phrases))
+                possible *= math.comb(len(phrases), take)
+                remaining -= take
+                if possible >= count:
+                    return None
+    if possible >= count:
+        return None
+    return (
+        f"Could not generate {count} distinct bingo cards for quest {quest.name}: "
+        f"only {possible} different sets of {description or f'{quest.language} phrases'} "
+        f"can be drawn{'' if shuffle else ' without shuffling'}."
+    )
+
+def check_line_overlap(
+    quest: Quest,
+    phrase_pools: Dict[str, List[List[str]]],
+    difficulties: List[str],
+    count: int,
+    max_line_overlap: int,
+    description: str | None = None
+) -> str | None:
+    """
+    Check that the pools of an available quest can allow count cards sharing at most
+    max_line_overlap phrases on a line.
+    
+    No two cards may hold the same (max_line_overlap + 1)-set of phrases on their
+    lines. A card holds one such set for every set of slots on one of its lines, so
+    for each mix of difficulties, count times the slot sets of that mix must not
+    exceed the phrase sets of that mix the buckets cards draw from can form. This
+    is necessary but not sufficient, generation can still fail later.
+    
+    Returns:
+        An error message if the bound is exceeded, None otherwise
+    """
+    subset_size = max_line_overlap + 1
+    slot_sets = {
+        frozenset(subset)
+        for _, slots in winning_lines(difficulties)
+        for subset in combinations(slots, subset_size)
+    }
+    per_card = Counter(tuple(sorted(difficulties[slot] for slot in slot_set)) for slot_set in slot_sets)
+    
+    # Cards take a fixed number of phrases from the first buckets and none from the rest
+    positions_per_difficulty = Counter(difficulties)
+    drawn = {}
+    for difficulty, needed in positions_per_difficulty.items():
+        drawn[difficulty] = 0
+        for phrases in phrase_pools[difficulty]:
+            if needed == 0:
+                break
+            drawn[difficulty] += len(phrases)
+            needed -= min(needed, len(phrases))
+    
+    for mix, sets_per_card in per_card.items():
+        possible = 1
+        for difficulty, size in Counter(mix).items():
+            possible *= math.comb(drawn[difficulty], size)
+        if count * sets_per_card > possible:
+            phrases = ", ".join(f"{size} {difficulty}" for difficulty, size in Counter(mix).items())
+            return (
+                f"Could not generate {count} bingo cards for quest {quest.name} sharing at most "
+                f"{max_line_overlap} phrases on a line: every card has {sets_per_card} sets of "
+                f"{phrases} {description or f'{quest.language} phrases'} on its lines and only "
+                f"{possible} different ones can be drawn."
+            )
+    return None
+
+def _fill_card(
+    phrase_pools: Dict[str, List[List[str]]],
+    positions_by_difficulty: Dict[str, List[int]],
+    card_size: int,
+    shuffle: bool,
+    rng=random
+) -> List[str]:
+    """
+    Fill one card from availability-checked pools without modifying them.
+    
+    Positions of a difficulty are taken in (shuffled) order and the pools are drained
+    in type preference order, so each (type, difficulty) bucket needs a single
+    sample() call and every draw is O(1) regardless of the pool size.
+    """
+    card = [None] * card_size
+    
+    for difficulty, positions in positions_by_difficulty.items():
+        if shuffle:
+            positions = rng.sample(positions, len(positions))
+        
+        filled = 0
+        for phrases in phrase_pools[difficulty]:
+            take = min(len(positions) - filled, len(phrases))
+            if not shuffle:
+                selected = phrases[:take]
+            elif isinstance(phrases, WeightedPool):
+                selected = [phrases[i] for i in weighted_sample(phrases.alias_table, take, rng)]
+            else:
+                selected = rng.sample(phrases, take)
+            for position, text in zip(positions[filled:filled + take], selected):
+                card[position] = text
+            filled += take
+            if filled == len(positions):
+                break
+        
+        if filled < len(positions):
+            raise RuntimeError(f"Failed to find phrase for {difficulty} despite availability check")
+    
+    return card
+
+def _batch_table(
+    phrase_pools: Dict[str, List[List[str]]],
+    positions_by_difficulty: Dict[str, List[int]]
+) -> tuple[np.ndarray, Dict[str, List[Tuple[int, int, int, AliasTable | None]]]]:
+    """
+    Combine the buckets a quest's batches draw from into one text table.
+    
+    Independent cards take the same number of phrases from each (type, difficulty)
+    bucket as _fill_card would, so only the choice of phrases and positions is random.
+    Buckets after those are kept with a take of 0, unique_across_cards moves on to
+    them once the earlier ones are used up.
+    
+    Returns:
+        Tuple of (texts, plan) where plan lists the (offset, pool_size, take, alias_table)
+        of the non-empty buckets of each difficulty in preference order, alias_table
+        being None for equal weights
+    """
+    texts: List[str] = []
+    plan = {}
+    for difficulty, positions in positions_by_difficulty.items():
+        plan[difficulty] = []
+        remaining = len(positions)
+        for phrases in phrase_pools[difficulty]:
+            if not phrases:
+                continue
+            take = min(remaining, len(phrases))
+            alias_table = phrases.alias_table if isinstance(phrases, WeightedPool) else None
+            plan[difficulty].append((len(texts), len(phrases), take, alias_table))
+            texts.extend(phrases)
+            remaining -= take
+        
+        if remaining:
+            raise RuntimeError(f"Failed to find phrase for {difficulty} despite availability check")
+    
+    return np.asarray(texts, dtype=object), plan
+
+def _sample_batch(
+    plan: Dict[str, List[Tuple[int, int, int, AliasTable | None]]],
+    positions_by_difficulty: Dict[str, List[int]],
+    card_size: int,
+    count: int,
+    shuffle: bool,
+    unique_across_cards: bool,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """Fill `count` cards at once as a (count x card_size) matrix of text table indices"""
+    card_indices = np.empty((count, card_size), dtype=np.int32)
+    rows = np.arange(count)[:, None]
+    
+    for difficulty, positions in positions_by_difficulty.items():
+        chosen = []
+        if unique_across_cards:
+            buckets = [(offset, pool_size, alias_table) for offset, pool_size, _, alias_table in plan[difficulty]]
+            chosen.append(_sample_unique_rows(buckets, len(positions), count, shuffle, rng))
+        for offset, pool_size, take, alias_table in plan[difficulty]:
+            if unique_across_cards or take == 0:
+                continue
+            if shuffle and alias_table is not None:
+                picks = weighted_sample_rows(alias_table, take, count, rng)
+            else:
+                picks = _sample_independent_rows(pool_size, take, count, shuffle, rng)
+            chosen.append(picks + offset)
+        
+        position_array = np.asarray(positions)
+        if shuffle:
+            position_array = position_array[rng.random((count, len(positions))).argsort(axis=1)]
+        card_indices[rows, position_array] = np.hstack(chosen)
+    
+    return card_indices
+
+def _sample_independent_rows(
+    pool_size: int,
+    take: int,
+    count: int,
+    shuffle: bool,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """Draw `take` distinct pool indices for each of `count` rows, independently per row"""
+    if not shuffle:
+        return np.broadcast_to(np.arange(take), (count, take))
+    
+    if pool_size > 64 * take:
+        # Sparse case: draw with replacement and redraw the few rows with a repeat
+        picks = np.empty((count, take), dtype=np.int64)
+        redraw = np.arange(count)
+        while redraw.size:
+            picks[redraw] = rng.integers(0, pool_size, (redraw.size, take))
+            ordered = np.sort(picks[redraw], axis=1)
+            redraw = redraw[(ordered[:, 1:] == ordered[:, :-1]).any(axis=1)]
+        return picks
+    
+    # Dense case: the `take` smallest of uniform keys form a uniform random subset
+    picks = np.empty((count, take), dtype=np.int64)
+    chunk = max(1, BATCH_KEYS_LIMIT // pool_size)
+    for start in range(0, count, chunk):
+        keys = rng.random((min(chunk, count - start), pool_size))
+        if take < pool_size:
+            picks[start:start + chunk] = np.argpartition(keys, take - 1, axis=1)[:, :take]
+        else:
+            picks[start:start + chunk] = keys.argsort(axis=1)
+    return picks
+
+def _unique_chunk_size(
+    plan: Dict[str, List[Tuple[int, int, int, AliasTable | None]]],
+    positions_by_difficulty: Dict[str, List[int]]
+) -> int:
+    """
+    Number of cards per task of a unique_across_cards batch.
+    
+    Passes of _sample_unique_rows are independent, so tasks of whole passes of every
+    difficulty draw the same kind of cards as a single task would. Chunks are the
+    smallest multiple of those passes reaching BATCH_CHUNK_SIZE cards or drawing
+    BATCH_KEYS_LIMIT keys, whichever comes first.
+    """
+    rows_per_pass = []
+    keys_per_row = 0.0
+    for difficulty, positions in positions_by_difficulty.items():
+        total = sum(pool_size for _, pool_size, _, _ in plan[difficulty])
+        rows_per_pass.append(total // len(positions))
+        keys_per_row += total / rows_per_pass[-1]
+    step = math.lcm(*rows_per_pass)
+    target = min(BATCH_CHUNK_SIZE, int(BATCH_KEYS_LIMIT // keys_per_row))
+    return step * max(1, target // step)
+
+def _sample_unique_rows(
+    buckets: List[Tuple[int, int, AliasTable | None]],
+    take: int,
+    count: int,
+    shuffle: bool,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draw `take` text table indices for each of `count` rows without reusing an index
+    between rows until the buckets run out.
+    
+    Args:
+        buckets: (offset, pool_size, alias_table) of the buckets in preference order
+    
+    Each pass is a permutation of every bucket, concatenated in preference order and
+    cut into rows, so cards drain the preferred bucket before moving on to the next
+    one. The last total % take indices of a pass are left over and a new pass starts.
+    With weights, heavier phrases tend to come earlier in each permutation. Passes
+    are drawn in blocks of at most BATCH_KEYS_LIMIT keys.
+    """
+    total = sum(pool_size for _, pool_size, _ in buckets)
+    rows_per_pass = total // take
+    passes = -(-count // rows_per_pass)
+    rows = np.empty((passes * rows_per_pass, take), dtype=np.int64)
+    block = max(1, BATCH_KEYS_LIMIT // total)
+    for start in range(0, passes, block):
+        block_passes = min(block, passes - start)
+        orders = []
+        for offset, pool_size, alias_table in buckets:
+            if shuffle and alias_table is not None:
+                order = weighted_permutations(alias_table, block_passes, rng)
+            elif shuffle:
+                order = rng.random((block_passes, pool_size)).argsort(axis=1)
+            else:
+                order = np.broadcast_to(np.arange(pool_size), (block_passes, pool_size))
+            orders.append(order + offset)
+        order = np.hstack(orders)
+        rows[start * rows_per_pass:(start + block_passes) * rows_per_pass] = (
+            order[:, :rows_per_pass * take].reshape(-1, take)
+        )
+    return rows[:count]
 
 if __name__ == '__main__':
     import unittest
+    from unittest import mock
     
     class TestGenerateCardsNoShuffle(unittest.TestCase):
         def setUp(self):
@@ -212,6 +878,16 @@ if __name__ == '__main__':
                     self.assertNotIn(phrase, all_phrases, "Phrase was repeated")
                     all_phrases.add(phrase)
 
+        def test_phrase_index_is_reused(self):
+            generate_cards(self.test_data, shuffle=False)
+            index = get_phrase_index(self.test_data)
+            
+            # A second call must reuse the index and leave its pools untouched
+            cards, error = generate_cards(self.test_data, shuffle=False)
+            self.assertIsNone(error)
+            self.assertIs(get_phrase_index(self.test_data), index)
+            self.assertEqual(len(index.pool("english", "type1", "easy")), 100)
+
     class TestGenerateCardsWithShuffle(unittest.TestCase):
         def test_randomized_positions_and_types(self):
             # Create test data with multiple types
@@ -267,4 +943,313 @@ if __name__ == '__main__':
             self.assertTrue(all(count > 0 for count in type1_counts), 
                           "Type1 (preferred) should always be used")
     
+    class TestGenerateCardsBatch(unittest.TestCase):
+        def make_data(self, per_type: int) -> BingoData:
+            phrases = [
+                Phrase(
+                    translations=[Translation(language="english", text=f"Type{t} {d} {i}")],
+                    type=f"type{t}",
+                    difficulty=d
+                )
+                for t in (1, 2)
+                for d in ("easy", "hard")
+                for i in range(per_type)
+            ]
+            return BingoData(
+                quests=[
+                    Quest(name="Quest 1", language="english", types=["type1", "type2"]),
+                    Quest(name="Quest 2", language="english", types=["type2"])
+                ],
+                phrases=phrases,
+                difficulties=["easy"] * 12 + ["hard"] * 4 + ["easy"] * 9
+            )
+
+        def test_cards_per_quest(self):
+            for pool_size in (30, 5000):
+                cards, error = generate_cards(self.make_data(pool_size), cards_per_quest=200)
+                self.assertIsNone(error)
+                self.assertEqual(len(cards), 400)
+                self.assertEqual([c['quest'] for c in cards], ["Quest 1"] * 200 + ["Quest 2"] * 200)
+                for card_data in cards:
+                    card = card_data['card']
+                    self.assertEqual(len(set(card)), 25, "Phrase was repeated within a card")
+                    self.assertTrue(all("hard" in text for text in card[12:16]))
+                    if card_data['quest'] == "Quest 2":
+                        self.assertTrue(all("Type2" in text for text in card))
+                # Preferred type is used up before the next one
+                self.assertEqual(sum("Type1" in text for text in cards[0]['card']), min(pool_size, 21) + 4)
+
+        def test_unique_across_cards(self):
+            cards, error = generate_cards(
+                self.make_data(100), cards_per_quest=10, unique_across_cards=True
+            )
+            self.assertIsNone(error)
+            quest_2_phrases = [text for c in cards if c['quest'] == "Quest 2" for text in c['card']]
+            # 100 easy and 100 hard phrases last for 4 cards (21 easy) and 25 cards (4 hard)
+            first_four = quest_2_phrases[:4 * 25]
+            self.assertEqual(len(set(first_four)), len(first_four))
+            for card_data in cards:
+                self.assertEqual(len(set(card_data['card'])), 25)
+
+        def test_batch_without_shuffle(self):
+            cards, error = generate_cards(
+                self.make_data(50), shuffle=False, cards_per_quest=3, unique_across_cards=True
+            )
+            self.assertIsNone(error)
+            self.assertEqual(cards[0]['card'][0], "Type1 easy 0")
+            self.assertEqual(cards[1]['card'][0], "Type1 easy 21")
+
+        def test_unique_chunks_are_whole_passes(self):
+            data = self.make_data(30)
+            # Quest 1 has 60 easy phrases for 21 fields and 60 hard ones for 4: passes
+            # of 2 and 15 cards. Quest 2 has 30 of each: passes of 1 and 7 cards
+            with mock.patch(f'{__name__}.BATCH_CHUNK_SIZE', 40):
+                cards, error = generate_cards(data, cards_per_quest=100, unique_across_cards=True, seed=6)
+                self.assertIsNone(error)
+                with mock.patch(f'{__name__}.PARALLEL_MIN_CARDS', 0):
+                    parallel, _ = generate_cards(
+                        data, cards_per_quest=100, unique_across_cards=True, seed=6, workers=2
+                    )
+            self.assertEqual(cards, parallel)
+            
+            for quest, passes in (("Quest 1", {"easy": 2, "hard": 15}), ("Quest 2", {"easy": 1, "hard": 7})):
+                quest_cards = [card['card'] for card in cards if card['quest'] == quest]
+                for difficulty, rows_per_pass in passes.items():
+                    for start in range(0, 100, rows_per_pass):
+                        texts = [
+                            text for card in quest_cards[start:start + rows_per_pass]
+                            for text in card if f" {difficulty} " in text
+                        ]
+                        self.assertEqual(len(set(texts)), len(texts))
+
+        def test_unique_moves_on_to_next_type(self):
+            # Quest 1 needs 21 easy phrases per card, type1's 30 run out during the second
+            cards, error = generate_cards(
+                self.make_data(30), cards_per_quest=2, unique_across_cards=True
+            )
+            self.assertIsNone(error)
+            quest_1 = [text for c in cards if c['quest'] == "Quest 1" for text in c['card']]
+            self.assertEqual(len(set(quest_1)), len(quest_1))
+            easy = [text for text in quest_1 if " easy " in text]
+            self.assertEqual(sum(text.startswith("Type1") for text in easy), 30)
+            self.assertEqual(sum(text.startswith("Type2") for text in easy), 12)
+
+        def test_repeated_type(self):
+            phrases = [
+                Phrase(translations=[Translation(language="english", text=f"Phrase {d} {i}")],
+                       type="t1", difficulty=d)
+                for d, count in (("easy", 15), ("hard", 5))
+                for i in range(count)
+            ]
+            data = BingoData(quests=[Quest(name="Quest", language="english", types=["t1", "t1"])],
+                             phrases=phrases, difficulties=["easy"] * 20 + ["hard"] * 5)
+            for cards_per_quest in (1, 3):
+                cards, error = generate_cards(data, cards_per_quest=cards_per_quest)
+                self.assertIsNone(cards)
+                self.assertIn("20 required, available by type: t1: 15.", error)
+            
+            data.phrases.extend(
+                Phrase(translations=[Translation(language="english", text=f"More {i}")], type="t1", difficulty="easy")
+                for i in range(5)
+            )
+            data._phrase_index = None
+            for cards_per_quest in (1, 3):
+                cards, error = generate_cards(data, cards_per_quest=cards_per_quest)
+                self.assertIsNone(error)
+                self.assertTrue(all(len(set(card['card'])) == 25 for card in cards))
+            cards, error = generate_cards(data, cards_per_quest=2, languages=["english"])
+            self.assertIsNone(error)
+            self.assertTrue(all(len(set(card['card'])) == 25 for card in cards))
+
+        def test_iter_cards(self):
+            cards, error = iter_cards(self.make_data(30), cards_per_quest=1500)
+            self.assertIsNone(error)
+            first = next(cards)
+            self.assertEqual(first['quest'], "Quest 1")
+            self.assertEqual(sum(1 for _ in cards), 2999)
+            
+            # A quest that cannot be filled fails before any card is produced
+            data = self.make_data(30)
+            data.quests.append(Quest(name="Quest 3", language="finnish", types=["type1"]))
+            cards, error = iter_cards(data)
+            self.assertIsNone(cards)
+            self.assertIn("Quest 3", error)
+
+        def test_seed_and_workers(self):
+            data = self.make_data(100)
+            for cards_per_quest in (1, 2500):
+                serial, error = generate_cards(data, cards_per_quest=cards_per_quest, seed=42)
+                self.assertIsNone(error)
+                with mock.patch(f'{__name__}.PARALLEL_MIN_CARDS', 0):
+                    parallel, error = generate_cards(data, cards_per_quest=cards_per_quest, seed=42, workers=3)
+                self.assertIsNone(error)
+                self.assertEqual(serial, parallel)
+            self.assertIn(3, _pools)
+            
+            other, _ = generate_cards(data, cards_per_quest=2500, seed=43)
+            self.assertNotEqual(serial, other)
+
+        def test_numbered_cards(self):
+            data = self.make_data(100)
+            cards, error = iter_numbered_cards(data, "dataset", 1, 0, 50)
+            self.assertIsNone(error)
+            cards = list(cards)
+            self.assertEqual([c['number'] for c in cards], list(range(50)))
+            self.assertGreater(len({tuple(c['card']) for c in cards}), 1)
+            
+            # Any card can be produced again on its own
+            again, _ = iter_numbered_cards(data, "dataset", 1, 42, 1)
+            self.assertEqual(list(again), [cards[42]])
+            other, _ = iter_numbered_cards(data, "other dataset", 1, 42, 1)
+            self.assertNotEqual(next(other)['card'], cards[42]['card'])
+            
+            cards, error = iter_numbered_cards(data, "dataset", 2, 0, 1)
+            self.assertIsNone(cards)
+            self.assertIsNotNone(error)
+
+        def test_aligned_languages(self):
+            data = self.make_data(60)
+            for phrase in data.phrases:
+                number = int(phrase.translations[0].text.split()[-1])
+                # Finnish for two thirds of the phrases
+                if number % 3:
+                    phrase.translations.append(Translation(language="finnish", text=f"fi {phrase.translations[0].text}"))
+            
+            cards, error = generate_cards(data, cards_per_quest=3, languages=["english", "finnish"])
+            self.assertIsNone(error)
+            self.assertEqual(len(cards), 12)
+            for english, finnish in zip(cards[::2], cards[1::2]):
+                self.assertEqual((english['language'], finnish['language']), ("english", "finnish"))
+                self.assertEqual(english['layout'], finnish['layout'])
+                self.assertEqual([f"fi {text}" for text in english['card']], finnish['card'])
+            
+            cards, error = generate_cards(
+                data, cards_per_quest=50, languages=["english", "finnish"], missing_translation='fallback'
+            )
+            self.assertIsNone(error)
+            self.assertTrue(any(
+                not text.startswith("fi ") for card in cards if card['language'] == "finnish" for text in card['card']
+            ))
+            
+            cards, error = generate_cards(data, languages=["english", "finnish"], missing_translation='error')
+            self.assertIsNone(cards)
+            self.assertIn("finnish", error)
+            
+            cards, error = generate_cards(data, languages=["english", "spanish"])
+            self.assertIsNone(cards)
+            self.assertIn("translated to english, spanish", error)
+
+        def test_distinct_cards(self):
+            cards, error = generate_cards(self.make_data(21), cards_per_quest=300, seed=5, distinct_cards=True)
+            self.assertIsNone(error)
+            self.assertEqual(len({frozenset(card['card']) for card in cards}), 600)
+            
+            # Quest 2 has 21 choose 4 different sets of hard phrases only
+            cards, error = generate_cards(self.make_data(21), cards_per_quest=6000, distinct_cards=True)
+            self.assertIsNone(cards)
+            self.assertIn("only 5985 different sets", error)
+            cards, error = generate_cards(self.make_data(21), shuffle=False, cards_per_quest=2, distinct_cards=True)
+            self.assertIn("without shuffling", error)
+
+        def test_max_line_overlap(self):
+            data = self.make_data(100)
+            cards, error = generate_cards(data, cards_per_quest=20, seed=9, max_line_overlap=2)
+            self.assertIsNone(error)
+            lines = [set(slots) for _, slots in winning_lines(data.difficulties)]
+            line_sets = [
+                [{card['card'][slot] for slot in slots} for slots in lines]
+                for card in cards
+            ]
+            for i in range(len(cards)):
+                for j in range(i):
+                    for line in line_sets[i]:
+                        self.assertTrue(all(len(line & other) <= 2 for other in line_sets[j]))
+            
+            # Every card holds all easy phrases of its first type, rejected up front
+            cards, error = generate_cards(self.make_data(21), cards_per_quest=2, max_line_overlap=0)
+            self.assertIsNone(cards)
+            self.assertIn("every card has 21 sets of 1 easy english phrases", error)
+            self.assertIn("only 21 different ones", error)
+            # The bound allows a second card only if it avoids every easy phrase of the
+            # first, which random redraws practically never do
+            cards, error = generate_cards(self.make_data(42), cards_per_quest=2, max_line_overlap=0)
+            self.assertIsNone(cards)
+            self.assertIn("Could not generate bingo card 2 of 2 for quest Quest 1", error)
+            
+            cards, error = generate_cards(
+                self.make_data(100), cards_per_quest=2, unique_across_cards=True, max_line_overlap=2
+            )
+            self.assertIsNone(cards)
+            self.assertIn("cannot be combined", error)
+
+        def test_invalid_cards_per_quest(self):
+            cards, error = generate_cards(self.make_data(30), cards_per_quest=0)
+            self.assertIsNone(cards)
+            self.assertIsNotNone(error)
+    
+    class TestWeightedSelection(unittest.TestCase):
+        """Empirical frequencies against exact inclusion probabilities, with fixed seeds"""
+        
+        weights = [1, 2, 3, 4, 10]
+        
+        def make_data(self, slots: int) -> BingoData:
+            phrases = [
+                Phrase(
+                    translations=[Translation(language="english", text=f"Phrase {i}")],
+                    type="type1",
+                    difficulty="easy",
+                    weight=weight
+                )
+                for i, weight in enumerate(self.weights)
+            ]
+            return BingoData(
+                quests=[Quest(name="Quest", language="english", types=["type1"])],
+                phrases=phrases,
+                difficulties=["easy"] * slots
+            )
+        
+        def inclusion_probabilities(self, slots: int) -> List[float]:
+            """Chance of each phrase to be on a card, drawing by weight without replacement"""
+            def visit(remaining, probability, depth, result):
+                if depth == slots:
+                    return
+                total = sum(self.weights[i] for i in remaining)
+                for i in remaining:
+                    p = probability * self.weights[i] / total
+                    result[i] += p
+                    visit(remaining - {i}, p, depth + 1, result)
+            result = [0.0] * len(self.weights)
+            visit(frozenset(range(len(self.weights))), 1.0, 0, result)
+            return result
+        
+        def assert_frequencies(self, cards: List[Dict[str, any]], slots: int):
+            n = len(cards)
+            counts = [0] * len(self.weights)
+            for card_data in cards:
+                self.assertEqual(len(set(card_data['card'])), slots)
+                for text in card_data['card']:
+                    counts[int(text.split()[-1])] += 1
+            for count, p in zip(counts, self.inclusion_probabilities(slots)):
+                # Within 4 standard deviations of the expected count
+                self.assertLess(abs(count - n * p), 4 * (n * p * (1 - p)) ** 0.5 + 1)
+        
+        def test_single_cards(self):
+            for slots in (1, 3):
+                data = self.make_data(slots)
+                cards, error = iter_numbered_cards(data, "dataset", 0, 0, 20000)
+                self.assertIsNone(error)
+                self.assert_frequencies(list(cards), slots)
+        
+        def test_batch(self):
+            for slots in (1, 3):
+                cards, error = generate_cards(self.make_data(slots), cards_per_quest=20000, seed=7)
+                self.assertIsNone(error)
+                self.assert_frequencies(cards, slots)
+        
+        def test_equal_weights_are_uniform(self):
+            data = self.make_data(1)
+            for phrase in data.phrases:
+                phrase.weight = 2.5
+            self.assertNotIsInstance(get_phrase_index(data).pool("english", "type1", "easy"), WeightedPool)
+    
     unittest.main()
\ No newline at end of file
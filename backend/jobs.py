@@ -0,0 +1,206 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, IO
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its limit"""
+
+class JobCancelled(Exception):
+    """Raised inside a job's work when the job was cancelled"""
+
+class Job:
+    """State of one background job, its output is written to a temporary NDJSON file"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.done = 0
+        self.total: int | None = None
+        self.error: str | None = None
+        self.path: str | None = None
+        self.created = time.time()
+        self.finished: float | None = None
+        self.future: Future | None = None
+        self.cleanup: Callable[[], None] | None = None
+        self._cancel = threading.Event()
+
+    def advance(self, count: int = 1) -> None:
+        """Report progress from the work, stopping it if the job was cancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.done += count
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished,
+        }
+
+class JobQueue:
+    """
+    Runs jobs on a bounded pool of local threads.
+
+    At most max_workers jobs run at a time and at most max_pending wait for a worker,
+    further submissions raise JobQueueFull so callers can push back on clients. A job
+    is a function work(job, file) -> error writing its output lines to file and calling
+    job.advance() as it goes, which is also where cancellation takes effect. An optional
+    cleanup function runs once the job ends, whether it ran or not. Finished jobs and
+    their files are dropped ttl seconds after they finish.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16,
+                 result_dir: str | None = None, ttl: float = 3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_dir = result_dir
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work: Callable[[Job, IO[str]], str | None],
+               cleanup: Callable[[], None] | None = None) -> Job:
+        job = Job()
+        job.cleanup = cleanup
+        with self._lock:
+            self._expire()
+            active = sum(1 for other in self._jobs.values() if other.active)
+            if active >= self.max_workers + self.max_pending:
+                raise JobQueueFull(f"{active} jobs are queued or running, try again later")
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued or running job. Returns the job, None if it is unknown"""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return job
+        job._cancel.set()
+        if job.future.cancel():
+            # Never started, so _run will not finish it
+            self._finish(job, 'cancelled')
+        return job
+
+    def shutdown(self) -> None:
+        """Cancel every active job and wait for the workers to stop"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: Job, work: Callable[[Job, IO[str]], str | None]) -> None:
+        if job._cancel.is_set():
+            self._finish(job, 'cancelled')
+            return
+        job.status = 'running'
+        fd, job.path = tempfile.mkstemp(prefix='bingo-job-', suffix='.ndjson', dir=self.result_dir)
+        try:
+            with open(fd, 'w', encoding='utf-8') as file:
+                error = work(job, file)
+        except JobCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            self._finish(job, 'failed', str(e))
+        else:
+            self._finish(job, 'failed' if error else 'done', error)
+
+    def _finish(self, job: Job, status: str, error: str | None = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        if status != 'done':
+            self._remove_file(job)
+        if job.cleanup is not None:
+            job.cleanup()
+
+    def _expire(self) -> None:
+        """Drop jobs that finished more than ttl seconds ago. Caller holds the lock"""
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                self._remove_file(job)
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _remove_file(job: Job) -> None:
+        if job.path is not None:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+            job.path = None
+
+if __name__ == '__main__':
+    import unittest
+
+    class TestJobQueue(unittest.TestCase):
+        def setUp(self):
+            self.queue = JobQueue(max_workers=1, max_pending=1, ttl=60)
+            self.release = threading.Event()
+
+        def tearDown(self):
+            self.release.set()
+            self.queue.shutdown()
+
+        def blocking_work(self, job, file):
+            job.total = 2
+            file.write('{"line": 1}\n')
+            job.advance()
+            while not self.release.wait(0.01):
+                job.advance(0)
+            file.write('{"line": 2}\n')
+            job.advance()
+
+        def test_result_and_progress(self):
+            job = self.queue.submit(self.blocking_work)
+            self.release.set()
+            job.future.result()
+            self.assertEqual((job.status, job.done, job.total), ('done', 2, 2))
+            with open(job.path, encoding='utf-8') as file:
+                self.assertEqual(file.read(), '{"line": 1}\n{"line": 2}\n')
+
+        def test_queue_limit_and_cancel(self):
+            running = self.queue.submit(self.blocking_work)
+            queued = self.queue.submit(self.blocking_work)
+            with self.assertRaises(JobQueueFull):
+                self.queue.submit(self.blocking_work)
+
+            self.queue.cancel(queued.id)
+            self.assertEqual(queued.status, 'cancelled')
+            self.queue.cancel(running.id)
+            running.future.result()
+            self.assertEqual(running.status, 'cancelled')
+            self.assertIsNone(running.path)
+            # Cancelled jobs no longer count against the limit
+            self.queue.submit(self.blocking_work)
+
+        def test_failure(self):
+            cleaned = []
+            job = self.queue.submit(lambda job, file: "Missing sheets: pattern", lambda: cleaned.append(1))
+            job.future.result()
+            self.assertEqual((job.status, job.error), ('failed', "Missing sheets: pattern"))
+            self.assertEqual(cleaned, [1])
+
+    unittest.main()
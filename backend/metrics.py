@@ -0,0 +1,214 @@
+"""
+Lightweight counters and latency histograms, exposed in Prometheus text format.
+
+Collection is off unless enable() is called (the app does so for METRICS_ENABLED=1).
+While it is off, timed() returns a shared no-op context manager and observe() and
+count() return after one flag check, so instrumented code pays next to nothing.
+
+Independently of that, start_timings() collects the stage durations of the current
+request for a Server-Timing header. Metrics are kept per process.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from contextlib import nullcontext
+from typing import Dict, List, Tuple
+import threading
+import time
+
+# Upper bounds of the histogram buckets by unit
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (10_000, 100_000, 500_000, 1_000_000, 2_000_000, 4_000_000, 8_000_000, 16_000_000)
+COUNT_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+_enabled = False
+# (stage, seconds) pairs of the current request, None when not collected
+_timings: ContextVar[List[Tuple[str, float]] | None] = ContextVar('timings', default=None)
+_NULL_CONTEXT = nullcontext()
+
+def enable(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+def is_enabled() -> bool:
+    return _enabled
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.label_names = label_names
+        # Labels -> (count per bucket with one for +Inf, sum)
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self.values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bucket] += 1
+            self.values[labels] = (counts, total + value)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels((*self.label_names, 'le'), (*labels, _format_number(bound)))
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                label_text = _format_labels(self.label_names, labels)
+                lines.append(f"{self.name}_sum{label_text} {_format_number(total)}")
+                lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for value in values
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+def _format_number(value) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+STAGE_SECONDS = Histogram(
+    'bingo_stage_seconds', 'Time spent in each stage of handling a workbook',
+    SECONDS_BUCKETS, ('stage',)
+)
+REQUEST_SECONDS = Histogram(
+    'bingo_request_seconds', 'Time to handle a request, streamed bodies excluded',
+    SECONDS_BUCKETS, ('endpoint',)
+)
+REQUESTS = Counter('bingo_requests_total', 'Handled requests', ('endpoint', 'status'))
+WORKBOOK_BYTES = Histogram('bingo_workbook_bytes', 'Size of uploaded workbooks', BYTES_BUCKETS)
+WORKBOOK_PHRASES = Histogram('bingo_workbook_phrases', 'Phrase rows of parsed workbooks', COUNT_BUCKETS)
+REQUEST_CARDS = Histogram('bingo_request_cards', 'Cards generated per request', COUNT_BUCKETS)
+CARDS = Counter('bingo_cards_generated_total', 'Generated cards')
+
+REGISTRY = (
+    STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, WORKBOOK_BYTES,
+    WORKBOOK_PHRASES, REQUEST_CARDS, CARDS
+)
+
+class _StageTimer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        if _enabled:
+            STAGE_SECONDS.observe(elapsed, self.stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((self.stage, elapsed))
+        return False
+
+def timed(stage: str):
+    """Context manager recording the duration of a stage"""
+    if not _enabled and _timings.get() is None:
+        return _NULL_CONTEXT
+    return _StageTimer(stage)
+
+def observe(histogram: Histogram, value: float, *labels: str) -> None:
+    if _enabled:
+        histogram.observe(value, *labels)
+
+def count(counter: Counter, amount: float = 1, *labels: str) -> None:
+    if _enabled:
+        counter.inc(amount, *labels)
+
+def start_timings() -> None:
+    """Collect the stage durations of the current context for server_timing()"""
+    _timings.set([])
+
+def server_timing() -> str | None:
+    """The collected stage durations as a Server-Timing header value, summed per stage"""
+    timings = _timings.get()
+    if not timings:
+        return None
+    totals: Dict[str, float] = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ', '.join(f"{stage};dur={elapsed * 1e3:.1f}" for stage, elapsed in totals.items())
+
+def expose() -> str:
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+if __name__ == '__main__':
+    import unittest
+
+    class TestMetrics(unittest.TestCase):
+        def tearDown(self):
+            enable(False)
+            _timings.set(None)
+
+        def test_disabled_is_a_no_op(self):
+            enable(False)
+            self.assertIs(timed('stage'), _NULL_CONTEXT)
+            counter = Counter('test_total', 'Test')
+            count(counter, 5)
+            self.assertEqual(counter.values, {})
+
+        def test_histogram_exposition(self):
+            enable()
+            histogram = Histogram('test_seconds', 'Test', (0.1, 1), ('stage',))
+            for value in (0.05, 0.1, 0.5, 3):
+                observe(histogram, value, 'parse')
+            self.assertEqual(histogram.expose(), [
+                '# HELP test_seconds Test',
+                '# TYPE test_seconds histogram',
+                'test_seconds_bucket{stage="parse",le="0.1"} 2',
+                'test_seconds_bucket{stage="parse",le="1"} 3',
+                'test_seconds_bucket{stage="parse",le="+Inf"} 4',
+                'test_seconds_sum{stage="parse"} 3.65',
+                'test_seconds_count{stage="parse"} 4',
+            ])
+
+        def test_server_timing(self):
+            start_timings()
+            with timed('upload'):
+                pass
+            with timed('upload'):
+                pass
+            with timed('generation'):
+                pass
+            header = server_timing()
+            self.assertRegex(header, r'^upload;dur=\d+\.\d, generation;dur=\d+\.\d$')
+            self.assertEqual(STAGE_SECONDS.values, {})  # Collection itself is still off
+
+    unittest.main()
@@ -0,0 +1,160 @@
+from typing import Dict, List, Sequence, Tuple
+import sys
+from schemas import BingoData
+from weighted_sampling import AliasTable
+import metrics
+
+# (language, type, difficulty)
+PoolKey = Tuple[str, str, str]
+
+MISSING_TRANSLATION_POLICIES = ('require', 'fallback', 'error')
+
+def parse_languages(text: str) -> List[str]:
+    """Split a comma separated list of languages, ignoring whitespace and empty items"""
+    return [language.strip() for language in text.split(',') if language.strip()]
+
+class WeightedPool(list):
+    """A pool of phrases whose weights are not all equal, with its alias table"""
+
+    def __init__(self, phrases: Sequence, weights: Sequence[float]):
+        super().__init__(phrases)
+        self.alias_table = AliasTable(weights)
+
+def make_pool(phrases: List, weights: List[float]) -> List:
+    """Return the phrases as they are if equally weighted, as a WeightedPool otherwise"""
+    if len(set(weights)) > 1:
+        return WeightedPool(phrases, weights)
+    return phrases
+
+class PhraseIndex:
+    """
+    Phrase texts grouped by (language, type, difficulty).
+
+    Also keeps phrases as language independent concepts: phrase IDs (positions in
+    BingoData.phrases) grouped by (type, difficulty), with the first text of each
+    phrase per language.
+
+    Pools with unequal phrase weights are WeightedPools, so samplers can tell
+    them apart and draw from their alias tables.
+
+    Built in a single pass over BingoData.phrases and treated as read-only
+    afterwards, so it can be shared between quests and between calls.
+    """
+
+    def __init__(self, data: BingoData):
+        self.pools: Dict[PoolKey, List[str]] = {}
+        self.concepts: Dict[Tuple[str, str], List[int]] = {}
+        self.texts: List[Dict[str, str]] = []
+        self.weights: List[float] = []
+        pool_weights: Dict[PoolKey, List[float]] = {}
+        for phrase_id, phrase in enumerate(data.phrases):
+            texts = {}
+            for trans in phrase.translations:
+                key = (trans.language, phrase.type, phrase.difficulty)
+                if key not in self.pools:
+                    self.pools[key] = []
+                    pool_weights[key] = []
+                self.pools[key].append(trans.text)
+                pool_weights[key].append(phrase.weight)
+                texts.setdefault(trans.language, trans.text)
+            self.texts.append(texts)
+            self.weights.append(phrase.weight)
+
+            concept_key = (phrase.type, phrase.difficulty)
+            if concept_key not in self.concepts:
+                self.concepts[concept_key] = []
+            self.concepts[concept_key].append(phrase_id)
+
+        for key, texts in self.pools.items():
+            self.pools[key] = make_pool(texts, pool_weights[key])
+
+    def memory_size(self) -> int:
+        """
+        Estimate the bytes the index holds: its lists and dicts, every text once
+        (pools and per-phrase texts share the same strings), phrase IDs, weights
+        and alias tables.
+        """
+        size = sum(map(sys.getsizeof, (self.pools, self.concepts, self.texts, self.weights)))
+        seen = set()
+        for pool in self.pools.values():
+            size += sys.getsizeof(pool)
+            for text in pool:
+                if id(text) not in seen:
+                    seen.add(id(text))
+                    size += sys.getsizeof(text)
+            if isinstance(pool, WeightedPool):
+                table = pool.alias_table
+                size += table.weights.nbytes + table.prob.nbytes + table.alias.nbytes
+                # The plain list copies of prob and alias, with a float and an int object per entry
+                size += sys.getsizeof(table._prob_list) + sys.getsizeof(table._alias_list) + 52 * len(table)
+        for texts in self.texts:
+            size += sys.getsizeof(texts)
+        for phrase_ids in self.concepts.values():
+            size += sys.getsizeof(phrase_ids) + 28 * len(phrase_ids)
+        return size + 24 * len(self.weights)
+
+    def pool(self, language: str, phrase_type: str, difficulty: str) -> List[str]:
+        """Return the (shared, do not modify) texts for a bucket, empty if none"""
+        return self.pools.get((language, phrase_type, difficulty), [])
+
+    def quest_pools(self, language: str, types: List[str], difficulties) -> Dict[str, List[List[str]]]:
+        """
+        Collect the buckets a quest needs as {difficulty: [texts per type]}.
+
+        The lists are in quest type preference order, a type listed more than once
+        counting at its first place only, and are the shared index lists, so callers
+        must not modify them.
+        """
+        types = list(dict.fromkeys(types))
+        return {
+            difficulty: [self.pool(language, phrase_type, difficulty) for phrase_type in types]
+            for difficulty in difficulties
+        }
+
+    def concept_pools(
+        self,
+        language: str,
+        types: List[str],
+        difficulties,
+        languages: List[str],
+        missing_translation: str = 'require'
+    ) -> Dict[str, List[List[int]]]:
+        """
+        Collect phrase IDs for a quest drawing one layout for several languages,
+        as {difficulty: [phrase IDs per type]} like quest_pools.
+
+        With the 'require' policy only phrases translated to every language are
+        included, otherwise phrases in the quest language are (missing texts are
+        then left to the caller, see missing_translations).
+        """
+        required = languages if missing_translation == 'require' else [language]
+        types = list(dict.fromkeys(types))
+        concept_pools = {}
+        for difficulty in difficulties:
+            concept_pools[difficulty] = []
+            for phrase_type in types:
+                phrase_ids = [
+                    phrase_id for phrase_id in self.concepts.get((phrase_type, difficulty), [])
+                    if all(required_language in self.texts[phrase_id] for required_language in required)
+                ]
+                weights = [self.weights[phrase_id] for phrase_id in phrase_ids]
+                concept_pools[difficulty].append(make_pool(phrase_ids, weights))
+        return concept_pools
+
+    def missing_translations(self, concept_pools: Dict[str, List[List[int]]], languages: List[str]) -> Dict[str, int]:
+        """Count the phrases of the pools without a text, by language"""
+        missing = {}
+        for pools in concept_pools.values():
+            for pool in pools:
+                for phrase_id in pool:
+                    for language in languages:
+                        if language not in self.texts[phrase_id]:
+                            missing[language] = missing.get(language, 0) + 1
+        return missing
+
+def get_phrase_index(data: BingoData) -> PhraseIndex:
+    """Return the phrase index of the data, building it on first use"""
+    if data._phrase_index is None:
+        with metrics.timed('phrase_index'):
+            data._phrase_index = PhraseIndex(data)
+    return data._phrase_index
@@ -0,0 +1,212 @@
+from collections import deque
+from typing import Dict, List, Tuple
+from schemas import BingoData
+from phrase_index import get_phrase_index
+from generate_cards import group_positions_by_difficulty
+
+def plan_capacity(data: BingoData) -> Dict[str, any]:
+    """
+    Work out how many cards the data supports without reusing any phrase.
+
+    Each quest is first planned on its own: a difficulty needing n fields per card
+    and holding a phrases over the quest's (language, type) buckets allows a // n
+    cards. This is what generate_cards with unique_across_cards produces before a
+    phrase repeats, as it drains the buckets in type preference order.
+
+    Quests with the same language can draw from the same buckets, so the number of
+    cards every quest can get at once without any two quests sharing a phrase
+    either is found per difficulty as a flow problem: quests demand cards * n
+    phrases, buckets supply their phrases to the quests using them, and the largest
+    feasible card count is binary searched. The generator keeps phrases unique per
+    quest only, so this is the bound for splitting the phrases between quests.
+    Only bucket sizes are used, nothing is generated.
+
+    Returns:
+        A dict with:
+        - 'quests': per quest its name, 'max_cards' alone and per difficulty the
+          'needed' fields per card, 'available' phrases and 'max_cards'
+        - 'shared_max_cards': cards per quest possible for all quests together
+          without phrases shared between quests
+        - 'limiting_difficulties': the difficulties that set shared_max_cards
+    """
+    index = get_phrase_index(data)
+    positions_by_difficulty = group_positions_by_difficulty(data.difficulties)
+
+    quest_buckets = [
+        frozenset((quest.language, phrase_type) for phrase_type in quest.types)
+        for quest in data.quests
+    ]
+
+    quests = []
+    for quest, buckets in zip(data.quests, quest_buckets):
+        difficulties = {}
+        for difficulty, positions in positions_by_difficulty.items():
+            available = sum(len(index.pool(language, phrase_type, difficulty)) for language, phrase_type in buckets)
+            difficulties[difficulty] = {
+                'needed': len(positions),
+                'available': available,
+                'max_cards': available // len(positions),
+            }
+        quests.append({
+            'quest': quest.name,
+            'max_cards': min((d['max_cards'] for d in difficulties.values()), default=0),
+            'difficulties': difficulties,
+        })
+
+    # Quests drawing from the same buckets are one node of the flow, demanding for all of them
+    groups: Dict[frozenset, int] = {}
+    for buckets in quest_buckets:
+        groups[buckets] = groups.get(buckets, 0) + 1
+
+    shared_by_difficulty = {}
+    for difficulty, positions in positions_by_difficulty.items():
+        sizes = {
+            bucket: len(index.pool(bucket[0], bucket[1], difficulty))
+            for buckets in quest_buckets for bucket in buckets
+        }
+        upper = min((q['difficulties'][difficulty]['max_cards'] for q in quests), default=0)
+        shared_by_difficulty[difficulty] = _max_uniform_cards(groups, sizes, len(positions), upper)
+
+    shared_max_cards = min(shared_by_difficulty.values(), default=0)
+    return {
+        'quests': quests,
+        'shared_max_cards': shared_max_cards,
+        'limiting_difficulties': [
+            difficulty for difficulty, cards in shared_by_difficulty.items() if cards == shared_max_cards
+        ],
+    }
+
+def _max_uniform_cards(
+    groups: Dict[frozenset, int],
+    sizes: Dict[Tuple[str, str], int],
+    needed: int,
+    upper: int
+) -> int:
+    """Binary search the largest card count every quest can fill at once, at most upper"""
+    lower = 0
+    while lower < upper:
+        cards = (lower + upper + 1) // 2
+        if _feasible(groups, sizes, cards * needed):
+            lower = cards
+        else:
+            upper = cards - 1
+    return lower
+
+def _feasible(groups: Dict[frozenset, int], sizes: Dict[Tuple[str, str], int], demand: int) -> bool:
+    """
+    Check if every quest can get demand phrases from its buckets at once.
+
+    Max flow (Edmonds-Karp) from a source to every group of quests with the same
+    buckets (capacity demand per quest), from groups to their buckets (unbounded)
+    and from buckets to a sink (their size).
+    """
+    buckets = list(sizes)
+    source, sink = 0, 1
+    bucket_node = {bucket: 2 + len(groups) + i for i, bucket in enumerate(buckets)}
+    node_count = 2 + len(groups) + len(buckets)
+
+    capacity: List[Dict[int, int]] = [{} for _ in range(node_count)]
+    def add_edge(u: int, v: int, cap: int):
+        capacity[u][v] = capacity[u].get(v, 0) + cap
+        capacity[v].setdefault(u, 0)
+
+    total = 0
+    for group_node, (own_buckets, quest_count) in enumerate(groups.items(), start=2):
+        add_edge(source, group_node, demand * quest_count)
+        total += demand * quest_count
+        for bucket in own_buckets:
+            add_edge(group_node, bucket_node[bucket], demand * quest_count)
+    for bucket, size in sizes.items():
+        add_edge(bucket_node[bucket], sink, size)
+
+    flow = 0
+    while True:
+        parents = {source: None}
+        queue = deque([source])
+        while queue and sink not in parents:
+            u = queue.popleft()
+            for v, cap in capacity[u].items():
+                if cap > 0 and v not in parents:
+                    parents[v] = u
+                    queue.append(v)
+        if sink not in parents:
+            break
+
+        path = []
+        v = sink
+        while parents[v] is not None:
+            path.append((parents[v], v))
+            v = parents[v]
+        pushed = min(capacity[u][v] for u, v in path)
+        for u, v in path:
+            capacity[u][v] -= pushed
+            capacity[v][u] += pushed
+        flow += pushed
+
+    return flow == total
+
+if __name__ == '__main__':
+    import unittest
+    from generate_cards import generate_cards
+    from schemas import Phrase, Quest, Translation
+
+    class TestPlanCapacity(unittest.TestCase):
+        def make_data(self, quests: List[Quest], counts: Dict[Tuple[str, str, str], int]) -> BingoData:
+            phrases = [
+                Phrase(translations=[Translation(language=language, text=f"{language} {t} {d} {i}")],
+                       type=t, difficulty=d)
+                for (language, t, d), count in counts.items()
+                for i in range(count)
+            ]
+            return BingoData(quests=quests, phrases=phrases, difficulties=["easy"] * 20 + ["hard"] * 5)
+
+        def test_single_quest(self):
+            data = self.make_data(
+                [Quest(name="A", language="english", types=["t1", "t2"])],
+                {("english", "t1", "easy"): 30, ("english", "t2", "easy"): 31, ("english", "t1", "hard"): 12}
+            )
+            plan = plan_capacity(data)
+            quest = plan['quests'][0]
+            self.assertEqual(quest['difficulties']['easy'], {'needed': 20, 'available': 61, 'max_cards': 3})
+            self.assertEqual(quest['difficulties']['hard']['max_cards'], 2)
+            self.assertEqual(quest['max_cards'], 2)
+            self.assertEqual(plan['shared_max_cards'], 2)
+            self.assertEqual(plan['limiting_difficulties'], ['hard'])
+
+        def test_planned_cards_do_not_repeat(self):
+            # The preferred t1 buckets run out after the first card
+            data = self.make_data(
+                [Quest(name="A", language="english", types=["t1", "t2"])],
+                {
+                    ("english", "t1", "easy"): 30, ("english", "t2", "easy"): 200,
+                    ("english", "t1", "hard"): 5, ("english", "t2", "hard"): 40,
+                }
+            )
+            max_cards = plan_capacity(data)['quests'][0]['max_cards']
+            self.assertEqual(max_cards, 9)
+            cards, error = generate_cards(data, cards_per_quest=max_cards, unique_across_cards=True, seed=1)
+            self.assertIsNone(error)
+            texts = [text for card in cards for text in card['card']]
+            self.assertEqual(len(set(texts)), len(texts))
+
+        def test_shared_buckets(self):
+            # A and B share t2, A also has t1 and C uses another language
+            data = self.make_data(
+                [
+                    Quest(name="A", language="english", types=["t1", "t2"]),
+                    Quest(name="B", language="english", types=["t2"]),
+                    Quest(name="C", language="finnish", types=["t2"]),
+                ],
+                {
+                    ("english", "t1", "easy"): 20, ("english", "t2", "easy"): 100,
+                    ("english", "t1", "hard"): 5, ("english", "t2", "hard"): 35,
+                    ("finnish", "t2", "easy"): 1000, ("finnish", "t2", "hard"): 1000,
+                }
+            )
+            plan = plan_capacity(data)
+            self.assertEqual([q['max_cards'] for q in plan['quests']], [6, 5, 50])
+            # 120 easy phrases for 20 per card of both A and B: 3 cards each
+            self.assertEqual(plan['shared_max_cards'], 3)
+            self.assertEqual(plan['limiting_difficulties'], ['easy'])
+
+    unittest.main()
@@ -0,0 +1,127 @@
+from html import escape
+from typing import Dict, Iterable, List, Tuple
+from schemas import BingoData
+
+# Styles of the printed cards, the same as the frontend's print view
+PRINT_STYLE = """
+@page { size: A4; margin: 0; }
+body { margin: 0; padding: 0; font-family: 'Cormorant Garamond', serif; background: white; color: black; }
+.print-container {
+    height: 297mm; width: 210mm; display: flex; flex-direction: column; align-items: center;
+    justify-content: flex-start; break-after: page; padding-top: 20mm; box-sizing: border-box; gap: 10mm;
+}
+.quest-title { font-family: 'Playfair Display', serif; font-size: 28pt; text-align: center; margin: 0; font-weight: 600; }
+.bingo-card {
+    width: 160mm; height: 160mm; display: grid; grid-template-columns: repeat(5, 1fr);
+    grid-template-rows: repeat(5, 1fr); border: 1px solid black;
+}
+.bingo-square {
+    border: 1px solid black; display: flex; justify-content: center; align-items: center;
+    font-size: 12pt; text-align: center; padding: 5px; word-wrap: break-word; overflow: hidden;
+}
+"""
+
+DOCUMENT_START = (
+    '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Bingo cards</title>'
+    f'<style>{PRINT_STYLE}</style></head><body>\n'
+)
+DOCUMENT_END = '</body></html>\n'
+
+class PrintRenderer:
+    """
+    Renders cards as print-ready HTML, one A4 page per card.
+
+    The markup around the squares of each quest's cards is built once, and every
+    phrase is escaped into its square markup the first time it is rendered, so a
+    page costs one dictionary lookup per square and a single join.
+    """
+
+    def __init__(self):
+        self._page_starts: Dict[str, str] = {}
+        self._squares: Dict[str, str] = {}
+
+    def page_start(self, quest_name: str) -> str:
+        start = self._page_starts.get(quest_name)
+        if start is None:
+            start = self._page_starts[quest_name] = (
+                f'<section class="print-container"><h1 class="quest-title">{escape(quest_name)}</h1>'
+                '<div class="bingo-card">'
+            )
+        return start
+
+    def square(self, text: str) -> str:
+        square = self._squares.get(text)
+        if square is None:
+            square = self._squares[text] = f'<div class="bingo-square">{escape(text)}</div>'
+        return square
+
+    def render_card(self, quest_name: str, card: List[str]) -> str:
+        squares = self._squares
+        parts = [self.page_start(quest_name)]
+        for text in card:
+            parts.append(squares.get(text) or self.square(text))
+        parts.append('</div></section>\n')
+        return ''.join(parts)
+
+    def render(self, cards: Iterable[Dict[str, any]], standalone: bool = False) -> str:
+        """
+        Render cards as returned by the card generators.
+        Args:
+            cards: Dicts with 'quest' and 'card'
+            standalone: Wrap the pages in a complete HTML document with the print styles,
+                otherwise return only the page sections
+        """
+        pages = ''.join(self.render_card(card['quest'], card['card']) for card in cards)
+        if standalone:
+            return DOCUMENT_START + pages + DOCUMENT_END
+        return pages
+
+def get_print_renderer(data: BingoData) -> PrintRenderer:
+    """Return the print renderer of the data, creating it on first use"""
+    if data._print_renderer is None:
+        data._print_renderer = PrintRenderer()
+    return data._print_renderer
+
+def page_ranges(quest_count: int, cards_per_quest: int, page: int, per_page: int) -> List[Tuple[int, int, int]]:
+    """
+    Locate a page of cards numbered quest by quest: cards 0 to cards_per_quest - 1 of
+    the first quest, then those of the second and so on.
+    Returns:
+        (quest_index, offset, limit) of the card numbers on the page, per quest
+    """
+    ranges = []
+    start = page * per_page
+    end = min(start + per_page, quest_count * cards_per_quest)
+    while start < end:
+        quest_index, offset = divmod(start, cards_per_quest)
+        limit = min(cards_per_quest - offset, end - start)
+        ranges.append((quest_index, offset, limit))
+        start += limit
+    return ranges
+
+if __name__ == '__main__':
+    import unittest
+    from schemas import Quest
+
+    class TestPrintPages(unittest.TestCase):
+        def test_page_ranges(self):
+            # 3 quests of 4 cards, pages of 5 cards
+            self.assertEqual(page_ranges(3, 4, 0, 5), [(0, 0, 4), (1, 0, 1)])
+            self.assertEqual(page_ranges(3, 4, 1, 5), [(1, 1, 3), (2, 0, 2)])
+            self.assertEqual(page_ranges(3, 4, 2, 5), [(2, 2, 2)])
+            self.assertEqual(page_ranges(3, 4, 3, 5), [])
+
+        def test_render_escapes_once(self):
+            data = BingoData(quests=[Quest(name="Q & A", language="english", types=["t"])],
+                             phrases=[], difficulties=["easy"] * 25)
+            renderer = get_print_renderer(data)
+            self.assertIs(get_print_renderer(data), renderer)
+            card = [f"<b>{i}</b>" for i in range(25)]
+            html = renderer.render([{'quest': "Q & A", 'card': card}] * 2)
+            self.assertEqual(html.count('<section class="print-container">'), 2)
+            self.assertIn('<h1 class="quest-title">Q &amp; A</h1>', html)
+            self.assertIn('<div class="bingo-square">&lt;b&gt;0&lt;/b&gt;</div>', html)
+            self.assertEqual(len(renderer._squares), 25)
+            self.assertTrue(renderer.render([], standalone=True).startswith('<!DOCTYPE html>'))
+
+    unittest.main()
@@ -1,5 +1,5 @@
-from typing import List
-from pydantic import BaseModel
+from typing import Any, List
+from pydantic import BaseModel, Field, PrivateAttr
 
 class Translation(BaseModel):
     language: str
@@ -9,6 +9,8 @@ class Phrase(BaseModel):
     translations: List[Translation]
     difficulty: str
     type: str
+    # Relative chance of being drawn compared to other phrases of its pool
+    weight: float = Field(default=1.0, gt=0, allow_inf_nan=False)
 
 class Quest(BaseModel):
     name: str
@@ -21,4 +23,9 @@ BingoCard = List[str]
 class BingoData(BaseModel):
     quests: List[Quest]
     phrases: List[Phrase]
-    difficulties: List[str]
\ No newline at end of file
+    difficulties: List[str]
+
+    # Lazily built PhraseIndex, see phrase_index.get_phrase_index
+    _phrase_index: Any = PrivateAttr(default=None)
+    # Lazily created PrintRenderer, see print_pages.get_print_renderer
+    _print_renderer: Any = PrivateAttr(default=None)
\ No newline at end of file
@@ -0,0 +1,66 @@
+from typing import BinaryIO
+import hashlib
+import os
+import tempfile
+import threading
+
+# Bytes copied at a time when spooling an upload
+CHUNK_SIZE = 1024 * 1024
+
+class UploadSlotsExhausted(Exception):
+    """Raised when every upload slot is taken"""
+
+class UploadSlots:
+    """
+    Limits how many uploads are spooled and parsed at the same time, so concurrent
+    large workbooks cannot exhaust the memory of a worker. Use as a context manager.
+    """
+
+    def __init__(self, slots: int, timeout: float = 0):
+        """
+        Args:
+            slots: Number of uploads handled at once
+            timeout: Seconds to wait for a free slot before giving up
+        """
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(slots)
+
+    def __enter__(self):
+        if self.timeout > 0:
+            acquired = self._semaphore.acquire(timeout=self.timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            raise UploadSlotsExhausted("Too many workbooks are being processed, try again later")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._semaphore.release()
+        return False
+
+def spool_upload(stream: BinaryIO, directory: str | None = None) -> tuple[str, str, int]:
+    """
+    Copy an uploaded file to a temporary file in chunks, hashing it on the way, so it
+    is never held in memory as a whole. The caller removes the file when done.
+    Returns:
+        A tuple of (path, sha256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix='bingo-upload-', suffix='.xlsx', dir=directory)
+    try:
+        with open(fd, 'wb') as file:
+            while chunk := stream.read(CHUNK_SIZE):
+                digest.update(chunk)
+                file.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest(), size
+
+def remove_upload(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,113 @@
+from typing import List, Sequence
+import random
+import numpy as np
+
+class AliasTable:
+    """
+    Walker/Vose alias table for O(1) draws of indices in proportion to weights.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        weights = np.asarray(weights, dtype=np.float64)
+        n = len(weights)
+        self.weights = weights
+        self.prob = np.zeros(n)
+        self.alias = np.zeros(n, dtype=np.int64)
+
+        scaled = weights * n / weights.sum()
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        for i in small + large:
+            self.prob[i] = 1
+
+        # Plain lists are faster to index one draw at a time
+        self._prob_list = self.prob.tolist()
+        self._alias_list = self.alias.tolist()
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng: random.Random) -> int:
+        """Draw one index with the random module API"""
+        u = rng.random() * len(self._prob_list)
+        i = int(u)
+        return i if u - i < self._prob_list[i] else self._alias_list[i]
+
+    def draw_many(self, rng: np.random.Generator, size) -> np.ndarray:
+        """Draw an array of independent indices"""
+        i = rng.integers(0, len(self.prob), size)
+        return np.where(rng.random(size) < self.prob[i], i, self.alias[i])
+
+def weighted_sample(table: AliasTable, take: int, rng: random.Random) -> List[int]:
+    """
+    Draw `take` distinct indices, each in proportion to its weight among those not yet drawn.
+
+    Repeats are rejected, which is exact for sampling without replacement and O(1)
+    per draw while the drawn phrases hold a modest share of the weight. Falls back
+    to one O(pool) pass if rejections pile up.
+    """
+    chosen = []
+    seen = set()
+    tries = 0
+    max_tries = 20 * take + 100
+    while len(chosen) < take and tries < max_tries:
+        i = table.draw(rng)
+        tries += 1
+        if i not in seen:
+            seen.add(i)
+            chosen.append(i)
+
+    if len(chosen) < take:
+        # Efraimidis-Spirakis keys give the same distribution for the rest
+        rest = [i for i in range(len(table)) if i not in seen]
+        keys = sorted(rest, key=lambda i: rng.random() ** (1 / table.weights[i]), reverse=True)
+        chosen.extend(keys[:take - len(chosen)])
+    return chosen
+
+def weighted_sample_rows(table: AliasTable, take: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw `take` distinct indices for each of `count` rows, like weighted_sample.
+
+    Each row takes the first `take` distinct values of a stream of alias draws. Rows
+    without enough distinct values yet get more draws appended, the few left after
+    that are completed by Efraimidis-Spirakis keys over the values not drawn.
+    """
+    picks = np.empty((count, take), dtype=np.int64)
+    pending = np.arange(count)
+    draws = np.empty((count, 0), dtype=np.int64)
+    candidates = 2 * take
+    for _ in range(3):
+        draws = np.hstack([draws, table.draw_many(rng, (pending.size, candidates))])
+
+        # Mark repeats of an earlier value in the row
+        order = np.argsort(draws, axis=1, kind='stable')
+        ordered = np.take_along_axis(draws, order, axis=1)
+        repeat = np.zeros(draws.shape, dtype=bool)
+        np.put_along_axis(repeat, order[:, 1:], ordered[:, 1:] == ordered[:, :-1], axis=1)
+
+        complete = (~repeat).sum(axis=1) >= take
+        first_distinct = np.argsort(repeat, axis=1, kind='stable')[:, :take]
+        picks[pending[complete]] = np.take_along_axis(draws, first_distinct, axis=1)[complete]
+        pending = pending[~complete]
+        draws = draws[~complete]
+        if not pending.size:
+            return picks
+        candidates *= 4
+
+    for row, row_draws in zip(pending, draws):
+        chosen = list(dict.fromkeys(row_draws.tolist()))
+        rest = np.setdiff1d(np.arange(len(table)), chosen)
+        keys = np.log(rng.random(rest.size)) / table.weights[rest]
+        picks[row] = chosen + rest[np.argsort(-keys)][:take - len(chosen)].tolist()
+    return picks
+
+def weighted_permutations(table: AliasTable, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Draw `count` orderings of all indices, each in weighted successive sampling order"""
+    keys = np.log(rng.random((count, len(table)))) / table.weights
+    return np.argsort(-keys, axis=1)
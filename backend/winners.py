@@ -0,0 +1,146 @@
+from typing import Dict, Iterable, List, Tuple
+import math
+import threading
+import uuid
+
+def winning_lines(difficulties: List[str]) -> List[Tuple[str, List[int]]]:
+    """
+    Derive the winning lines of the square board described by the pattern.
+    Returns:
+        (name, slots) for every row, column and both diagonals
+    """
+    size = math.isqrt(len(difficulties))
+    if size * size != len(difficulties):
+        raise ValueError(f"Pattern of {len(difficulties)} fields is not a square board")
+
+    lines = []
+    for row in range(size):
+        lines.append((f"row {row + 1}", [row * size + col for col in range(size)]))
+    for col in range(size):
+        lines.append((f"column {col + 1}", [row * size + col for row in range(size)]))
+    lines.append(("diagonal", [i * size + i for i in range(size)]))
+    lines.append(("anti-diagonal", [i * size + size - 1 - i for i in range(size)]))
+    return lines
+
+class BingoGame:
+    """
+    Tracks called phrases against a set of issued cards and reports new winners.
+
+    Every card keeps a bit mask of its marked slots. An inverted index maps each
+    phrase to the (card, slot) pairs holding it, so a call only touches the cards
+    that contain the phrase and tests them against the line masks of that slot.
+    """
+
+    def __init__(self, cards: List[Dict[str, any]], difficulties: List[str]):
+        """
+        Args:
+            cards: Cards as returned by generate_cards, dicts with 'quest' and 'card'
+            difficulties: The pattern the cards were generated with
+        """
+        lines = winning_lines(difficulties)
+        self.cards = cards
+        self.line_names = [name for name, _ in lines]
+        self.line_masks = [sum(1 << slot for slot in slots) for _, slots in lines]
+        # Lines through each slot, as (line number, mask) pairs
+        self.slot_lines: List[List[Tuple[int, int]]] = [[] for _ in difficulties]
+        for line_number, (_, slots) in enumerate(lines):
+            for slot in slots:
+                self.slot_lines[slot].append((line_number, self.line_masks[line_number]))
+
+        self.phrase_slots: Dict[str, List[Tuple[int, int]]] = {}
+        for card_index, card_data in enumerate(cards):
+            if len(card_data['card']) != len(difficulties):
+                raise ValueError(f"Card {card_index} has {len(card_data['card'])} fields, the pattern has {len(difficulties)}")
+            for slot, phrase in enumerate(card_data['card']):
+                self.phrase_slots.setdefault(phrase, []).append((card_index, slot))
+
+        self.marks = [0] * len(cards)
+        self.won_lines = [0] * len(cards)  # Bit per line already reported
+        self.called: List[str] = []
+        self._lock = threading.Lock()
+
+    def call(self, phrase: str) -> List[Dict[str, any]]:
+        """
+        Mark a called phrase on every card holding it.
+        Returns:
+            The lines completed by this call, as dicts with card index, quest and line name
+            (and card number for numbered cards)
+        """
+        winners = []
+        with self._lock:
+            self.called.append(phrase)
+            for card_index, slot in self.phrase_slots.get(phrase, ()):
+                marks = self.marks[card_index] | (1 << slot)
+                self.marks[card_index] = marks
+                for line_number, mask in self.slot_lines[slot]:
+                    line_bit = 1 << line_number
+                    if marks & mask == mask and not self.won_lines[card_index] & line_bit:
+                        self.won_lines[card_index] |= line_bit
+                        winner = {
+                            'card': card_index,
+                            'quest': self.cards[card_index]['quest'],
+                            'line': self.line_names[line_number],
+                        }
+                        if 'number' in self.cards[card_index]:
+                            winner['number'] = self.cards[card_index]['number']
+                        winners.append(winner)
+        return winners
+
+    def call_many(self, phrases: Iterable[str]) -> List[Dict[str, any]]:
+        """Call several phrases in order and return all lines they complete"""
+        return [winner for phrase in phrases for winner in self.call(phrase)]
+
+class GameRegistry:
+    """In-process store of running games, dropping the oldest beyond `max_games`"""
+
+    def __init__(self, max_games: int = 100):
+        self.max_games = max_games
+        self._games: Dict[str, BingoGame] = {}
+        self._lock = threading.Lock()
+
+    def create(self, cards: List[Dict[str, any]], difficulties: List[str]) -> str:
+        game = BingoGame(cards, difficulties)
+        game_id = uuid.uuid4().hex
+        with self._lock:
+            self._games[game_id] = game
+            while len(self._games) > self.max_games:
+                del self._games[next(iter(self._games))]
+        return game_id
+
+    def get(self, game_id: str) -> BingoGame | None:
+        with self._lock:
+            return self._games.get(game_id)
+
+if __name__ == '__main__':
+    import unittest
+
+    class TestBingoGame(unittest.TestCase):
+        def setUp(self):
+            self.difficulties = ["easy"] * 25
+            self.cards = [
+                {'quest': "Quest", 'card': [f"phrase {i}" for i in range(25)]},
+                {'quest': "Quest", 'card': [f"phrase {24 - i}" for i in range(25)]},
+            ]
+
+        def test_lines(self):
+            lines = dict(winning_lines(self.difficulties))
+            self.assertEqual(len(lines), 12)
+            self.assertEqual(lines["column 2"], [1, 6, 11, 16, 21])
+            self.assertEqual(lines["anti-diagonal"], [4, 8, 12, 16, 20])
+
+        def test_call(self):
+            game = BingoGame(self.cards, self.difficulties)
+            self.assertEqual(game.call_many(f"phrase {i}" for i in range(4)), [])
+            self.assertEqual(game.call("unknown phrase"), [])
+            winners = game.call("phrase 4")
+            # Row 1 of the first card, row 5 of the reversed second card
+            self.assertEqual(winners, [
+                {'card': 0, 'quest': "Quest", 'line': "row 1"},
+                {'card': 1, 'quest': "Quest", 'line': "row 5"},
+            ])
+            # A line is reported once
+            self.assertEqual(game.call("phrase 4"), [])
+            winners = game.call_many(f"phrase {i}" for i in (8, 12, 16, 20))
+            self.assertIn({'card': 0, 'quest': "Quest", 'line': "anti-diagonal"}, winners)
+
+    unittest.main()
@@ -0,0 +1,299 @@
+from collections import OrderedDict
+from typing import Dict, Tuple
+import hashlib
+import os
+import re
+import threading
+import time
+from pydantic import ValidationError
+from schemas import BingoData
+from extract_bingo_data import extract_bingo_data
+from datasets import compact_dataset
+from phrase_index import get_phrase_index
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+class WorkbookCache:
+    """
+    LRU cache of validated BingoData keyed by the SHA-256 of the uploaded workbook.
+
+    Only the compact form of the data is kept (see datasets.compact_dataset), which
+    is what get and get_or_extract return. Entries are evicted when they are older
+    than `ttl` seconds or when the cache holds more than `max_entries` entries or
+    roughly `max_bytes` of data, estimated from the memory held by their phrase
+    index. If `disk_dir` is set, parsed workbooks are also written there as JSON so
+    that a restarted worker starts warm. Every write to it removes
+    the files older than `ttl`, then the oldest written until at most `max_disk_bytes`
+    remain, so the directory should not be shared with anything else.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 3600, disk_dir: str | None = None,
+                 max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[BingoData, int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(file_content: bytes) -> str:
+        """Return the cache key of the workbook content"""
+        return hashlib.sha256(file_content).hexdigest()
+
+    def get(self, key: str) -> BingoData | None:
+        """Return the cached data for the key, None on a miss. Not counted in the stats"""
+        data, _ = self._lookup(key)
+        return data
+
+    def put(self, key: str, data: BingoData) -> BingoData:
+        """Store validated data under the key, returning the compact form that is kept"""
+        if self.disk_dir:
+            self._write_disk(key, data.model_dump_json())
+        return self._store(key, data)
+
+    def get_or_extract(self, file_content: bytes | str, key: str | None = None) -> tuple[BingoData | None, str | None]:
+        """
+        Return the data of the workbook, parsing it only if it is not cached.
+        Args:
+            file_content: Raw bytes of the Excel file, or the path of a file holding them
+            key: Cache key of the content if already computed, required for paths
+        Returns:
+            A tuple of (validated_data, error) like extract_bingo_data
+        """
+        if key is None:
+            if not isinstance(file_content, (bytes, bytearray)):
+                raise ValueError("The cache key of a workbook read from a path must be given")
+            key = self.key(file_content)
+        data, tier = self._lookup(key)
+        with self._lock:
+            if tier == 'memory':
+                self.hits += 1
+            elif tier == 'disk':
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        if data is not None:
+            return data, None
+
+        data, error = extract_bingo_data(file_content)
+        if data is not None:
+            data = self.put(key, data)
+        return data, error
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit/miss counters of get_or_extract and the current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (the disk tier is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _lookup(self, key: str) -> tuple[BingoData | None, str | None]:
+        """Return the cached data for the key and the tier it was found in, 'memory' or 'disk'"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                data, size, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return data, 'memory'
+                self._remove(key)
+
+        data = self._read_disk(key)
+        if data is None:
+            return None, None
+        return self._store(key, data), 'disk'
+
+    def _store(self, key: str, data: BingoData) -> BingoData:
+        """Keep the compact form of the data, unless it alone exceeds max_bytes, and return it"""
+        compact = compact_dataset(data)
+        size = get_phrase_index(compact).memory_size()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return compact
+            self._entries[key] = (compact, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return compact
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> BingoData | None:
+        # Keys can come from URLs, never turn anything but a hash into a path
+        if not self.disk_dir or not KEY_PATTERN.fullmatch(key):
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as file:
+                return BingoData.model_validate_json(file.read())
+        except (OSError, ValidationError):
+            return None
+
+    def _write_disk(self, key: str, serialized: str) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(serialized)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is best effort, the in-memory entry is already stored
+            pass
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Remove expired files, then the oldest until the disk tier fits max_disk_bytes"""
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.json') or not KEY_PATTERN.fullmatch(name[:-len('.json')]):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - self.ttl
+        for modified, size, path in files:
+            if modified >= cutoff and total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    import unittest
+    from unittest import mock
+    from schemas import Phrase, Quest, Translation
+
+    def make_data(name: str) -> BingoData:
+        phrases = [
+            Phrase(translations=[Translation(language="english", text=f"{name} {i}")], type="t", difficulty="easy")
+            for i in range(30)
+        ]
+        return BingoData(quests=[Quest(name=name, language="english", types=["t"])],
+                         phrases=phrases, difficulties=["easy"] * 25)
+
+    class TestWorkbookCache(unittest.TestCase):
+        def test_ttl_expiry(self):
+            cache = WorkbookCache(ttl=10)
+            with mock.patch('time.monotonic', return_value=0):
+                cache.put('a', make_data("A"))
+            with mock.patch('time.monotonic', return_value=10):
+                self.assertIsNotNone(cache.get('a'))
+            with mock.patch('time.monotonic', return_value=11):
+                self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.stats()['entries'], 0)
+
+        def test_lru_eviction(self):
+            cache = WorkbookCache(max_entries=2)
+            cache.put('a', make_data("A"))
+            cache.put('b', make_data("B"))
+            cache.get('a')
+            cache.put('c', make_data("C"))
+            self.assertIsNotNone(cache.get('a'))
+            self.assertIsNone(cache.get('b'))
+            self.assertIsNotNone(cache.get('c'))
+
+        def test_byte_eviction(self):
+            size = get_phrase_index(make_data("A")).memory_size()
+            cache = WorkbookCache(max_bytes=2 * size)
+            for key in 'abc':
+                cache.put(key, make_data(key.upper()))
+            self.assertEqual(cache.stats()['entries'], 2)
+            self.assertEqual(cache.stats()['bytes'], 2 * size)
+            self.assertIsNone(cache.get('a'))
+            # Data larger than the whole cache is not kept
+            small = WorkbookCache(max_bytes=size - 1)
+            small.put('a', make_data("A"))
+            self.assertEqual(small.stats()['entries'], 0)
+
+        def test_disk_tier(self):
+            key = WorkbookCache.key(b"workbook")
+            with tempfile.TemporaryDirectory() as disk_dir:
+                WorkbookCache(disk_dir=disk_dir).put(key, make_data("A"))
+                restarted = WorkbookCache(disk_dir=disk_dir)
+                with mock.patch(f'{__name__}.extract_bingo_data') as extract:
+                    data, error = restarted.get_or_extract(b"workbook")
+                extract.assert_not_called()
+                self.assertEqual((data.quests[0].name, error), ("A", None))
+                self.assertEqual(restarted.stats()['disk_hits'], 1)
+                # Keys that are not hashes never reach the file system
+                self.assertIsNone(restarted.get('../' + key))
+
+        def test_disk_bound(self):
+            keys = [WorkbookCache.key(bytes([i])) for i in range(3)]
+            size = len(make_data("A").model_dump_json())
+            with tempfile.TemporaryDirectory() as disk_dir:
+                cache = WorkbookCache(disk_dir=disk_dir, max_disk_bytes=2 * size)
+                # Written in turn, the third write removes the oldest file
+                for i, key in enumerate(keys):
+                    cache.put(key, make_data("A"))
+                    os.utime(cache._disk_path(key), (i, time.time() - 10 + i))
+                self.assertEqual(sorted(os.listdir(disk_dir)), sorted(f"{key}.json" for key in keys[1:]))
+
+        def test_stores_compact_form(self):
+            cache = WorkbookCache()
+            data = make_data("A")
+            with mock.patch.object(BingoData, 'model_dump_json') as dump:
+                stored = cache.put('a', data)
+            dump.assert_not_called()  # Nothing to serialize without a disk tier
+            self.assertIs(cache.get('a'), stored)
+            self.assertEqual(stored.phrases, [])
+            self.assertIs(get_phrase_index(stored), get_phrase_index(data))
+            # Every text and its list slots at least
+            texts = get_phrase_index(data).pools[("english", "t", "easy")]
+            self.assertGreater(cache.stats()['bytes'], sum(sys.getsizeof(text) + 8 for text in texts))
+
+        def test_counters(self):
+            cache = WorkbookCache()
+            with mock.patch(f'{__name__}.extract_bingo_data', return_value=(make_data("A"), None)) as extract:
+                cache.get_or_extract(b"workbook")
+                cache.get_or_extract(b"workbook")
+                cache.get(WorkbookCache.key(b"workbook"))
+                cache.get('unknown')
+            self.assertEqual(extract.call_count, 1)
+            stats = cache.stats()
+            self.assertEqual((stats['hits'], stats['disk_hits'], stats['misses']), (1, 0, 1))
+            with self.assertRaises(ValueError):
+                cache.get_or_extract('/path/to/workbook.xlsx')
+
+    unittest.main()